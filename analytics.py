@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+import datastore
+import filestats
+import resultcache
+import summary
+from salesdb import PARQUET_DIR_TARGET, SalesEngine
+from schemas import clean_col, quote
+
+# =========================
+# HISTORICAL SUMMARY (HEADLESS)
+# =========================
+# Logika pivot tab Analytics tanpa Streamlit: dipakai dashboard, CLI, dan
+# batch precompute malam hari.
+#
+#   python analytics.py summary --closing 2025-12 --hist 2025-11 --filter REGION=SUMATERA
+#   python analytics.py precompute                    # semua pasangan bulan di data
+#
+# Hasil precompute (tanpa filter) → data/precomputed/summary/<versi>/<closing>_<hist>.parquet.
+# Versi = rollup sales + dataset target → upload baru otomatis membuat hasil lama tidak terpakai.
+PRECOMPUTE_DIR = Path("data/precomputed/summary")
+
+PRECOMPUTE_INFO = "precompute.json"
+
+
+def where_clauses(filters):
+    # {kolom: [nilai, ...]} → klausa IN untuk summary_spec (kolom tanpa pilihan dilewati).
+    # Opsi filter berasal dari kolom kanonik _clean_* → filter juga di kolom yang sama
+    clauses = []
+    for col, vals in (filters or {}).items():
+        if vals:
+            safe_vals = ",".join("'" + str(v).replace("'", "''") + "'" for v in vals)
+            clauses.append(f"{quote(clean_col(col))} IN ({safe_vals})")
+    return clauses
+
+
+def historical_summary(con, closing, hist, filters=None):
+    # closing / hist: (tahun, bulan)
+    spec = summary.summary_spec(closing[0], closing[1], hist[0], hist[1], where_clauses(filters))
+    target_source = filestats.pruned_source(
+        con, PARQUET_DIR_TARGET, [spec["hist"], spec["next"]], fallback="target"
+    )
+    return summary.run_summary(con, spec, target_source)[0]
+
+
+# =========================
+# PRECOMPUTE
+# =========================
+def summary_version(rollup_version, target_version):
+    return resultcache.cache_key("summary", rollup_version, target_version)[:16]
+
+
+def engine_version(engine):
+    return summary_version(engine.rollup_version, datastore.dataset_version(PARQUET_DIR_TARGET))
+
+
+def precomputed_path(version, closing, hist):
+    return PRECOMPUTE_DIR / version / f"{closing[0]}-{closing[1]:02d}_{hist[0]}-{hist[1]:02d}.parquet"
+
+
+def load_precomputed(version, closing, hist):
+    path = precomputed_path(version, closing, hist)
+    try:
+        return pq.read_table(path)
+    except (FileNotFoundError, OSError):
+        return None
+
+
+def _write_atomic(table, out):
+    out.parent.mkdir(parents=True, exist_ok=True)
+    staged = out.with_name(f".{out.stem}-{uuid.uuid4().hex}.tmp")
+    try:
+        pq.write_table(table, staged)
+        os.replace(staged, out)
+    finally:
+        staged.unlink(missing_ok=True)
+
+
+def data_months(con):
+    # semua (TAHUN, MONTH) yang ada di rollup sales
+    return [
+        (int(y), int(m))
+        for y, m in con.execute(
+            'SELECT DISTINCT TAHUN, "MONTH" FROM sales_monthly ORDER BY 1, 2'
+        ).fetchall()
+    ]
+
+
+def month_range(start, end):
+    y, m = start
+    months = []
+    while (y, m) <= end:
+        months.append((y, m))
+        y, m = summary._next_month(y, m)
+    return months
+
+
+def precompute_all(engine, closing_months, hist_months, force=False, on_progress=None):
+    # 1 query per pasangan (closing, historical); pasangan yang sudah ada dilewati
+    con = engine.cursor()
+    version = engine_version(engine)
+    pairs = [(c, h) for c in closing_months for h in hist_months]
+    started = time.perf_counter()
+    computed = skipped = 0
+
+    for i, (closing, hist) in enumerate(pairs, start=1):
+        out = precomputed_path(version, closing, hist)
+        if out.exists() and not force:
+            skipped += 1
+        else:
+            _write_atomic(historical_summary(con, closing, hist), out)
+            computed += 1
+        if on_progress:
+            on_progress(i, len(pairs), closing, hist)
+
+    # versi lama tidak akan dibaca lagi oleh dashboard
+    (PRECOMPUTE_DIR / version).mkdir(parents=True, exist_ok=True)
+    for old in PRECOMPUTE_DIR.iterdir():
+        if old.is_dir() and old.name != version:
+            shutil.rmtree(old, ignore_errors=True)
+
+    info = {
+        "version": version,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "pairs": len(pairs),
+        "computed": computed,
+        "skipped": skipped,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    (PRECOMPUTE_DIR / version / PRECOMPUTE_INFO).write_text(json.dumps(info, indent=2))
+    return info
+
+
+# =========================
+# CLI
+# =========================
+def parse_month(value):
+    # "2025-03" → (2025, 3)
+    try:
+        y, m = (int(p) for p in value.split("-"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"format bulan harus YYYY-MM: {value}")
+    if not 1 <= m <= 12:
+        raise argparse.ArgumentTypeError(f"bulan di luar 1-12: {value}")
+    return y, m
+
+
+def parse_filter(value):
+    # "REGION=SUMATERA,JAWA" → ("REGION", ["SUMATERA", "JAWA"])
+    col, sep, vals = value.partition("=")
+    if not sep or not col:
+        raise argparse.ArgumentTypeError(f"format filter harus KOLOM=nilai1,nilai2: {value}")
+    return col.strip(), [v.strip() for v in vals.split(",") if v.strip()]
+
+
+def _cmd_summary(engine, args):
+    filters = {}
+    for col, vals in args.filter:
+        filters.setdefault(col, []).extend(vals)
+    table = historical_summary(engine.cursor(), args.closing, args.hist, filters)
+
+    if args.out is None:
+        with pd.option_context("display.max_rows", None, "display.width", None):
+            print(table.to_pandas().to_string(index=False))
+    elif args.out.endswith(".csv"):
+        pacsv.write_csv(table, args.out, pacsv.WriteOptions(quoting_style="needed"))
+    else:
+        pq.write_table(table, args.out)
+    print(f"{table.num_rows:,} baris", file=sys.stderr)
+
+
+def _cmd_precompute(engine, args):
+    months = data_months(engine.cursor())
+    if not months:
+        print("Data sales kosong, tidak ada yang di-precompute", file=sys.stderr)
+        return
+
+    first, last = months[0], months[-1]
+    # closing month default sampai 1 bulan setelah data terakhir (bulan berjalan)
+    closing = month_range(args.closing_from or summary._next_month(*first),
+                          args.closing_to or summary._next_month(*last))
+    hist = month_range(args.hist_from or first, args.hist_to or last)
+
+    def progress(i, total, c, h):
+        if i % 50 == 0 or i == total:
+            print(f"  {i:,}/{total:,}  closing {c[0]}-{c[1]:02d}  hist {h[0]}-{h[1]:02d}", file=sys.stderr)
+
+    info = precompute_all(engine, closing, hist, force=args.force, on_progress=progress)
+    print(json.dumps(info, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Historical Summary tanpa UI")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("summary", help="hitung 1 Historical Summary")
+    p.add_argument("--closing", type=parse_month, required=True, help="bulan closed, YYYY-MM")
+    p.add_argument("--hist", type=parse_month, required=True, help="bulan historical week, YYYY-MM")
+    p.add_argument("--filter", type=parse_filter, action="append", default=[],
+                   help="KOLOM=nilai1,nilai2 (boleh berulang)")
+    p.add_argument("--out", default=None, help="file .parquet / .csv (default: cetak ke layar)")
+
+    p = sub.add_parser("precompute", help="batch semua pasangan (closing, historical) tanpa filter")
+    p.add_argument("--closing-from", type=parse_month)
+    p.add_argument("--closing-to", type=parse_month)
+    p.add_argument("--hist-from", type=parse_month)
+    p.add_argument("--hist-to", type=parse_month)
+    p.add_argument("--force", action="store_true", help="hitung ulang walau file sudah ada")
+
+    args = parser.parse_args(argv)
+    engine = SalesEngine()
+    if args.command == "summary":
+        _cmd_summary(engine, args)
+    else:
+        _cmd_precompute(engine, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+# =========================
+# BENCHMARK SALES / TARGET / LDGT
+# =========================
+# python -m bench.generate --scale 10m     → data sintetis (seeded)
+# python -m bench.run --scale 10m          → timing pipeline + laporan JSON
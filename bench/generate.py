@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import time
+from datetime import date
+from pathlib import Path
+
+import duckdb
+
+from ldgtmap import CABANG_LOOKUP
+
+# =========================
+# DATA SINTETIS (SEEDED)
+# =========================
+# Semua nilai diturunkan dari nomor baris + seed lewat hash integer sendiri
+# (bukan random() / hash() DuckDB) → data identik di setiap mesin, jumlah
+# thread, dan versi DuckDB. Laporan benchmark antar versi bisa dibandingkan.
+BENCH_DATA_DIR = Path(__file__).parent / "data"
+
+SCALES = {
+    "100k": 100_000,
+    "10m": 10_000_000,
+    "100m": 100_000_000,
+}
+
+# kardinalitas dimensi per skala (SKU, distributor)
+CARDINALITY = {
+    "100k": {"sku": 500, "distributor": 50},
+    "10m": {"sku": 2_000, "distributor": 200},
+    "100m": {"sku": 5_000, "distributor": 500},
+}
+
+# baris per file upload (1 file = 1 ingest)
+FILE_ROWS = 5_000_000
+
+START_DATE = date(2024, 1, 1)
+YEARS = 3
+
+REGIONS = ["SUMATERA", "JAWA", "KALIMANTAN", "SULAWESI", "BALI NUSRA"]
+TIPES = ["REGULAR", "PROMO", "BUNDLING", "SAMPLE"]
+KETS = ["SELL IN", "SELL OUT"]
+
+FORMATS = {
+    "parquet": ("parquet", "FORMAT PARQUET, COMPRESSION ZSTD"),
+    "csv": ("csv", "FORMAT CSV, HEADER, DELIMITER ','"),
+}
+
+
+def _sql_list(values):
+    return "[" + ", ".join("'" + v.replace("'", "''") + "'" for v in values) + "]"
+
+
+def _connect(seed):
+    # hash 31-bit (multiply-xorshift); semua perkalian muat di BIGINT
+    con = duckdb.connect()
+    con.execute("CREATE MACRO _xs(x) AS xor(x, x >> 16)")
+    con.execute("CREATE MACRO _mx(x) AS (_xs(x) * 73244475) % 2147483648")
+    con.execute(
+        f"CREATE MACRO rnd(i, salt) AS "
+        f"_xs(_mx(_mx((i * 1103515245 + salt * 2654435 + {int(seed)}) % 2147483648)))"
+    )
+    return con
+
+
+def sales_select(start, end, cardinality):
+    n_days = (date(START_DATE.year + YEARS, 1, 1) - START_DATE).days
+    return f"""
+        WITH base AS (
+            SELECT
+                i,
+                rnd(i, 1) % {cardinality['distributor']}                        AS d,
+                rnd(i, 2) % {cardinality['sku']}                                AS s,
+                DATE '{START_DATE}' + CAST(rnd(i, 3) % {n_days} AS INTEGER)     AS dt,
+                rnd(i, 4) % 1000000                                             AS v,
+                rnd(i, 5) % 100                                                 AS noise
+            FROM range({start}, {end}) t(i)
+        )
+        SELECT
+            -- 1% nilai kotor (huruf kecil + spasi) → jalur cleaning TRIM/UPPER ikut teruji
+            CASE WHEN noise = 0
+                THEN lower({_sql_list(REGIONS)}[d % {len(REGIONS)} + 1]) || ' '
+                ELSE {_sql_list(REGIONS)}[d % {len(REGIONS)} + 1]
+            END                                               AS "REGION",
+            'AREA ' || lpad(CAST(d % 20 AS VARCHAR), 2, '0')  AS "AREA",
+            'SO ' || lpad(CAST(d % 50 AS VARCHAR), 2, '0')    AS "SALES OFFICE",
+            'G' || lpad(CAST(s % 12 AS VARCHAR), 2, '0')      AS "GROUP",
+            'DIST ' || lpad(CAST(d AS VARCHAR), 4, '0')       AS "DISTRIBUTOR",
+            {_sql_list(TIPES)}[s % {len(TIPES)} + 1]          AS "TIPE",
+            'SKU' || lpad(CAST(s AS VARCHAR), 5, '0')         AS "SKU",
+            -- serial Excel, seperti file export dari sistem sumber
+            CAST(dt - DATE '1899-12-30' AS INTEGER)           AS "TANGGAL",
+            CAST(weekofyear(dt) AS INTEGER)                   AS "WEEK",
+            CAST(year(dt) AS INTEGER)                         AS "TAHUN",
+            CAST(month(dt) AS INTEGER)                        AS "MONTH",
+            CASE WHEN noise IN (1, 2) THEN -v ELSE v END / 100.0 AS "Value"
+        FROM base
+    """
+
+
+def target_select(cardinality):
+    n_months = YEARS * 12
+    return f"""
+        SELECT
+            'SKU' || lpad(CAST(s AS VARCHAR), 5, '0')                      AS "SKU",
+            CAST({START_DATE.year} + m // 12 AS INTEGER)                    AS "TAHUN",
+            CAST(m % 12 + 1 AS INTEGER)                                     AS "MONTH",
+            (rnd(s * {n_months} + m, 11) % 5000000) / 100.0                 AS "Value"
+        FROM range({cardinality['sku']}) t1(s), range({n_months}) t2(m)
+    """
+
+
+def ldgt_select(rows, cardinality):
+    # CABANG di luar lookup (~2%) → baris dibuang agregasi peta, seperti data asli
+    cabang = list(CABANG_LOOKUP) + ["Unknown Branch"]
+    return f"""
+        WITH base AS (
+            SELECT
+                i,
+                rnd(i, 21) % {YEARS * 12}               AS m,
+                rnd(i, 22) % 50                         AS c,
+                rnd(i, 23) % {cardinality['distributor']} AS d,
+                rnd(i, 24) % {cardinality['sku']}       AS s,
+                rnd(i, 25) % 1000000                    AS v
+            FROM range({rows}) t(i)
+        )
+        SELECT
+            CAST({START_DATE.year} + m // 12 AS INTEGER)            AS "Thn",
+            CAST(m % 12 + 1 AS INTEGER)                             AS "MONTH",
+            CASE WHEN c = 0
+                THEN 'Unknown Branch'
+                ELSE {_sql_list(cabang[:-1])}[c % {len(cabang) - 1} + 1]
+            END                                                     AS "CABANG",
+            'DIST ' || lpad(CAST(d AS VARCHAR), 4, '0')             AS "DISTRIBUTOR",
+            'SKU' || lpad(CAST(s AS VARCHAR), 5, '0')               AS "SKU",
+            {_sql_list(KETS)}[s % 2 + 1]                            AS "KET",
+            v / 100.0                                               AS "NET VALUE"
+        FROM base
+    """
+
+
+def _copy(con, select_sql, out, options):
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(f".{out.name}.tmp")
+    con.execute(f"COPY ({select_sql}) TO '{tmp}' ({options})")
+    os.replace(tmp, out)
+
+
+def data_dir(scale, seed, fmt="parquet", base=BENCH_DATA_DIR):
+    return Path(base) / f"{scale}-seed{seed}-{fmt}"
+
+
+def scale_rows(scale):
+    if scale in SCALES:
+        return SCALES[scale]
+    return int(scale)
+
+
+def generate(scale, seed=42, fmt="parquet", base=BENCH_DATA_DIR, file_rows=FILE_ROWS, force=False):
+    # hasil disimpan per (skala, seed, format); dipakai ulang jika sudah ada
+    out_dir = data_dir(scale, seed, fmt, base)
+    marker = out_dir / "generated.json"
+    if marker.exists() and not force:
+        return json.loads(marker.read_text())
+
+    rows = scale_rows(scale)
+    cardinality = CARDINALITY.get(scale, CARDINALITY["10m"])
+    ext, options = FORMATS[fmt]
+    con = _connect(seed)
+    started = time.perf_counter()
+
+    try:
+        sales_files = []
+        for n, start in enumerate(range(0, rows, file_rows)):
+            out = out_dir / "sales" / f"sales-{n:03d}.{ext}"
+            _copy(con, sales_select(start, min(start + file_rows, rows), cardinality), out, options)
+            sales_files.append(out.name)
+
+        target_out = out_dir / "target" / f"target-000.{ext}"
+        _copy(con, target_select(cardinality), target_out, options)
+
+        # LDGT selalu parquet: aplikasi memuat data/ldgt/latest.parquet
+        ldgt_out = out_dir / "ldgt" / "latest.parquet"
+        _copy(con, ldgt_select(rows, cardinality), ldgt_out, FORMATS["parquet"][1])
+
+        target_rows = con.execute(f"SELECT COUNT(*) FROM ({target_select(cardinality)})").fetchone()[0]
+    finally:
+        con.close()
+
+    info = {
+        "scale": scale,
+        "seed": seed,
+        "format": fmt,
+        "rows": {"sales": rows, "target": int(target_rows), "ldgt": rows},
+        "cardinality": cardinality,
+        "files": {
+            "sales": sales_files,
+            "target": [target_out.name],
+            "ldgt": [ldgt_out.name],
+        },
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    marker.write_text(json.dumps(info, indent=2))
+    return info
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generator data sintetis sales / target / LDGT")
+    parser.add_argument("--scale", default="100k", help="100k | 10m | 100m | jumlah baris")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", default="parquet", choices=list(FORMATS))
+    parser.add_argument("--out", default=str(BENCH_DATA_DIR))
+    parser.add_argument("--file-rows", type=int, default=FILE_ROWS)
+    parser.add_argument("--force", action="store_true", help="generate ulang walau sudah ada")
+    args = parser.parse_args(argv)
+
+    info = generate(args.scale, args.seed, args.format, args.out, args.file_rows, args.force)
+    print(json.dumps(info, indent=2))
+
+
+if __name__ == "__main__":
+    main()
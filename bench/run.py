@@ -0,0 +1,292 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+import analytics
+import datastore
+import dimensions
+import filestats
+import ingest
+import summary
+from bench import generate as gen
+from ldgtmap import aggregate_map
+from salesdb import PARQUET_DIR_SALES, PARQUET_DIR_TARGET, SalesEngine
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+REPORT_DIR = Path(__file__).parent / "reports"
+
+# median lebih lambat dari baseline × (1 + toleransi) → dianggap regresi
+DEFAULT_TOLERANCE = 0.20
+
+# selisih di bawah ini dianggap noise (step yang sangat cepat)
+NOISE_SECONDS = 0.05
+
+# =========================
+# TIMING
+# =========================
+def timed(fn, repeat=1):
+    runs = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - started)
+    return result, runs
+
+
+def record(results, step, runs, rows=None):
+    entry = {
+        "runs": [round(r, 4) for r in runs],
+        "min": round(min(runs), 4),
+        "median": round(statistics.median(runs), 4),
+    }
+    if rows:
+        entry["rows"] = int(rows)
+        entry["rows_per_sec"] = round(rows / max(min(runs), 1e-9))
+    results[step] = entry
+    print(f"  {step:<28} median {entry['median']:>9.3f}s  ({len(runs)}x)", flush=True)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(8 * 1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# =========================
+# LANGKAH BENCHMARK
+# =========================
+def bench_ingest(results, data, fmt, dataset, directory, data_type):
+    # pipeline upload yang sama dengan tab Import: ingest_path → commit_ingest
+    meta_base = {"type": fmt}
+    if fmt == "csv":
+        meta_base["delimiter"] = ","
+
+    files = sorted((data / dataset).glob(f"*.{gen.FORMATS[fmt][0]}"))
+    con = duckdb.connect()
+    total_rows = 0
+
+    def run():
+        nonlocal total_rows
+        for path in files:
+            meta = dict(meta_base, name=path.name)
+            res = ingest.ingest_path(path, meta, directory, data_type)
+            ingest.commit_ingest(con, path.name, _sha256(path), res, directory)
+            total_rows += res["rows"]
+
+    try:
+        _, runs = timed(run)
+    finally:
+        con.close()
+    record(results, f"ingest_{dataset}", runs, total_rows)
+
+
+def bench_engine(results):
+    # view + stats + rollup + kamus filter (start aplikasi pertama kali)
+    engine, runs = timed(SalesEngine)
+    record(results, "engine_refresh", runs)
+    return engine
+
+
+def bench_distinct(results, engine, repeat):
+    # jalur aplikasi: kamus filter dari file sidecar
+    _, runs = timed(dimensions.load_dictionary, repeat)
+    record(results, "get_distinct", runs)
+
+    # pembanding: DISTINCT langsung di view sales (1 scan per kolom filter)
+    con = engine.cursor()
+
+    def scan():
+        return {
+            col: con.execute(
+                f'SELECT DISTINCT TRIM(UPPER("{col}")) FROM sales WHERE "{col}" IS NOT NULL'
+            ).fetchall()
+            for col in dimensions.FILTER_COLS
+        }
+
+    _, runs = timed(scan, repeat)
+    record(results, "get_distinct_scan", runs)
+
+
+def bench_summary(results, engine, repeat, legacy=False):
+    con = engine.cursor()
+    # bulan closed = periode terakhir di data, historical = bulan sebelumnya
+    tahun_akhir, bulan_akhir = con.execute(
+        'SELECT TAHUN, "MONTH" FROM sales_monthly ORDER BY TAHUN DESC, "MONTH" DESC LIMIT 1'
+    ).fetchone()
+    tahun_hist, bulan_hist = summary._prev_month(tahun_akhir, bulan_akhir)
+    region = con.execute('SELECT MIN("_clean_REGION") FROM sales_monthly').fetchone()[0]
+
+    scenarios = {
+        "summary": [],
+        "summary_filtered": analytics.where_clauses({"REGION": [region]}),
+    }
+    for step, where_clauses in scenarios.items():
+        spec = summary.summary_spec(tahun_akhir, bulan_akhir, tahun_hist, bulan_hist, where_clauses)
+        target_source = filestats.pruned_source(
+            con, PARQUET_DIR_TARGET, [spec["hist"], spec["next"]], fallback="target"
+        )
+        _, runs = timed(lambda: summary.run_summary(con, spec, target_source), repeat)
+        record(results, step, runs)
+
+        if legacy:
+            _, runs = timed(lambda: summary.run_summary(con, spec, legacy=True), repeat)
+            record(results, f"{step}_legacy", runs)
+
+
+def bench_ldgt(results, data, repeat):
+    # jalur tab Analytics LDGT: load parquet → normalisasi → agregasi peta
+    df_raw, runs = timed(lambda: pd.read_parquet(data / "ldgt" / "latest.parquet"))
+    record(results, "ldgt_load", runs, len(df_raw))
+
+    def run():
+        df = df_raw.copy()
+        df['Tahun'] = pd.to_numeric(df['Thn'], errors='coerce')
+        df['Month'] = pd.to_numeric(df['MONTH'], errors='coerce')
+        df['NET VALUE'] = pd.to_numeric(df['NET VALUE'], errors='coerce')
+        df = df.dropna(subset=['Tahun', 'Month'])
+        return aggregate_map(df)
+
+    _, runs = timed(run, repeat)
+    record(results, "ldgt_map_aggregate", runs, len(df_raw))
+
+
+# =========================
+# LAPORAN
+# =========================
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    # {step: (baseline, sekarang, rasio, regresi?)} untuk step yang ada di keduanya
+    rows = {}
+    for step, entry in report["results"].items():
+        base = baseline.get("results", {}).get(step)
+        if not base:
+            continue
+        ratio = entry["median"] / max(base["median"], 1e-9)
+        regressed = ratio > 1 + tolerance and entry["median"] - base["median"] > NOISE_SECONDS
+        rows[step] = (base["median"], entry["median"], ratio, regressed)
+    return rows
+
+
+def print_comparison(rows, baseline):
+    print(f"\nvs baseline {baseline.get('label')} ({baseline.get('git_commit')}):")
+    for step, (base, now, ratio, regressed) in rows.items():
+        flag = "REGRESI" if regressed else ""
+        print(f"  {step:<28} {base:>9.3f}s → {now:>9.3f}s  x{ratio:5.2f}  {flag}")
+
+
+def run(args):
+    info = gen.generate(args.scale, args.seed, args.format, args.data_dir)
+    data = gen.data_dir(args.scale, args.seed, args.format, args.data_dir).resolve()
+
+    # semua path aplikasi relatif ke "data/..." → jalankan di folder kerja kosong
+    # --workdir + tanpa step ingest → data hasil run sebelumnya dipakai ulang
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="bench-")).resolve()
+    steps = set(args.steps)
+    if "ingest" in steps and (workdir / "data").exists():
+        shutil.rmtree(workdir / "data")
+    workdir.mkdir(parents=True, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    print(f"bench {args.scale} (seed {args.seed}, {args.format}) di {workdir}", flush=True)
+
+    results = {}
+    try:
+        if "ingest" in steps or not datastore.has_data(PARQUET_DIR_SALES):
+            bench_ingest(results, data, args.format, "sales", PARQUET_DIR_SALES, "Sales")
+            bench_ingest(results, data, args.format, "target", PARQUET_DIR_TARGET, "Target")
+        engine = bench_engine(results)
+        if "distinct" in steps:
+            bench_distinct(results, engine, args.repeat)
+        if "summary" in steps:
+            bench_summary(results, engine, args.repeat, args.legacy)
+        if "ldgt" in steps:
+            bench_ldgt(results, data, args.repeat)
+    finally:
+        os.chdir(cwd)
+        if not args.workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "label": args.label,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "scale": args.scale,
+        "seed": args.seed,
+        "format": args.format,
+        "rows": info["rows"],
+        "environment": {
+            "python": platform.python_version(),
+            "duckdb": duckdb.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline sales / target / LDGT")
+    parser.add_argument("--scale", default="100k", help="100k | 10m | 100m | jumlah baris")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", default="parquet", choices=list(gen.FORMATS))
+    parser.add_argument("--repeat", type=int, default=3, help="pengulangan untuk step query")
+    parser.add_argument(
+        "--steps", nargs="+", default=["ingest", "distinct", "summary", "ldgt"],
+        choices=["ingest", "distinct", "summary", "ldgt"]
+    )
+    parser.add_argument("--legacy", action="store_true", help="ukur juga query summary lama")
+    parser.add_argument("--label", default=None, help="nama laporan (default: commit git)")
+    parser.add_argument("--data-dir", default=str(gen.BENCH_DATA_DIR))
+    parser.add_argument("--workdir", default=None, help="folder kerja (default: folder sementara)")
+    parser.add_argument("--keep", action="store_true", help="jangan hapus folder kerja sementara")
+    parser.add_argument("--out", default=None, help="path laporan JSON")
+    parser.add_argument("--baseline", default=None, help="laporan JSON pembanding")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+    args.label = args.label or _git_commit() or "local"
+
+    report = run(args)
+
+    out = Path(args.out) if args.out else (
+        REPORT_DIR / f"{args.label}-{args.scale}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"\nlaporan: {out}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        rows = compare(report, baseline, args.tolerance)
+        print_comparison(rows, baseline)
+        if any(regressed for *_, regressed in rows.values()):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
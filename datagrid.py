@@ -0,0 +1,92 @@
+import math
+
+import streamlit as st
+
+from schemas import quote
+
+# =========================
+# DATA GRID (SERVER-SIDE)
+# =========================
+# Paging, sorting dan filter kolom dijalankan di DuckDB (LIMIT / OFFSET);
+# hanya 1 halaman yang dikirim ke frontend, berapa pun ukuran datasetnya.
+PAGE_SIZES = [50, 100, 500, 1000]
+
+NO_CHOICE = "—"
+
+
+def grid_where(filter_col, filter_text):
+    # filter teks "mengandung" (case-insensitive), nilai dikirim sebagai parameter
+    if filter_col in (None, NO_CHOICE) or not filter_text:
+        return "", []
+    return (
+        f"WHERE CAST({quote(filter_col)} AS VARCHAR) ILIKE ?",
+        [f"%{filter_text}%"],
+    )
+
+
+def grid_sql(source, where, sort_col=None, descending=False):
+    order = ""
+    if sort_col not in (None, NO_CHOICE):
+        order = f"ORDER BY {quote(sort_col)} {'DESC' if descending else 'ASC'} NULLS LAST"
+    return f"""
+        SELECT *
+        FROM {source}
+        {where}
+        {order}
+        LIMIT ? OFFSET ?
+    """
+
+
+def count_sql(source, where):
+    return f"SELECT COUNT(*) FROM {source} {where}"
+
+
+@st.cache_data(max_entries=64)
+def _cached_execute(_con, sql, params, version):
+    # version = versi dataset → halaman yang sama tidak di-query ulang
+    return _con.execute(sql, list(params)).df()
+
+
+def _execute(con, sql, params, version):
+    if version is None:
+        return con.execute(sql, list(params)).df()
+    return _cached_execute(con, sql, tuple(params), version)
+
+
+def data_grid(con, source, key, version=None, page_sizes=PAGE_SIZES):
+    # source: nama view / tabel atau subquery "(SELECT ...)"
+    # version: token versi dataset (None → tanpa cache)
+    columns = [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+
+    c1, c2, c3, c4 = st.columns([2, 1, 2, 2])
+    sort_col = c1.selectbox("Urutkan", [NO_CHOICE] + columns, key=f"{key}_sort")
+    descending = c2.toggle("Desc", key=f"{key}_desc")
+    filter_col = c3.selectbox("Filter kolom", [NO_CHOICE] + columns, key=f"{key}_filter_col")
+    filter_text = c4.text_input("Mengandung", key=f"{key}_filter_text")
+
+    where, params = grid_where(filter_col, filter_text.strip())
+    total = int(_execute(con, count_sql(source, where), params, version).iloc[0, 0])
+
+    p1, p2, p3 = st.columns([1, 1, 2])
+    page_size = p1.selectbox("Baris / halaman", page_sizes, key=f"{key}_page_size")
+    n_pages = max(1, math.ceil(total / page_size))
+
+    # filter / ukuran halaman berubah → nomor halaman lama bisa di luar jangkauan
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > n_pages:
+        st.session_state[page_key] = n_pages
+    page = p2.number_input("Halaman", min_value=1, max_value=n_pages, step=1, key=page_key)
+
+    offset = (int(page) - 1) * page_size
+    df_page = _execute(
+        con,
+        grid_sql(source, where, sort_col, descending),
+        params + [page_size, offset],
+        version,
+    )
+
+    first = offset + 1 if total else 0
+    p3.caption(f"Baris {first:,}–{offset + len(df_page):,} dari {total:,} · {n_pages:,} halaman")
+
+    st.dataframe(df_page, use_container_width=True, hide_index=True)
+    return df_page
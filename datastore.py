@@ -0,0 +1,569 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import manifest
+
+from schemas import (
+    SCHEMAS,
+    clean_col,
+    clean_expr,
+    missing_clean_cols,
+    needs_retype,
+    quote,
+    rejected_select,
+    typed_select,
+)
+
+# =========================
+# LAYOUT DATASET (HIVE)
+# =========================
+# <dataset>/TAHUN=2025/MONTH=3/part-<uuid>.parquet   ← fragment hasil upload
+# <dataset>/TAHUN=2025/MONTH=3/data-<uuid>.parquet   ← hasil compaction
+PARTITION_COLS = ["TAHUN", "MONTH"]
+PARTITION_GLOB = "*/*/*.parquet"
+
+# commit tulis ulang ditolak (input sudah diganti penulis lain) → diulang sebanyak ini
+COMMIT_RETRIES = 3
+
+# kelipatan vector size DuckDB (2048) → row group besar tapi scan tetap paralel
+COMPACT_ROW_GROUP_SIZE = 245_760
+
+# compaction otomatis jalan jika ada partisi dengan fragment sebanyak ini
+COMPACT_MIN_FILES = 8
+
+# baris yang gagal validasi schema → side file per dataset
+REJECT_DIR = Path("data/rejected")
+
+# output worker ingest sebelum dipindah ke folder dataset
+STAGING_DIR = Path("data/staging")
+
+# lease pembaca: data/snapshots/<dataset>/<holder>.pin berisi generation yang dipegang
+SNAPSHOT_PIN_DIR = Path("data/snapshots")
+
+# lease yang tidak diperbarui selama ini dianggap mati (session ditutup / idle)
+PIN_TTL_SECONDS = 15 * 60
+
+_compaction_lock = threading.Lock()
+_compaction_running = set()
+
+
+# =========================
+# HELPER
+# =========================
+def has_data(directory):
+    # file flat lama belum masuk snapshot → tetap dianggap ada (dimigrasi saat refresh)
+    return bool(snapshot_files(directory)[1]) or any(Path(directory).glob("*.parquet"))
+
+
+def parquet_source(directory, files=None):
+    # daftar file eksplisit dari snapshot, bukan glob → file yang sedang
+    # ditulis / dipensiunkan tidak pernah ikut terbaca
+    if files is None:
+        files = snapshot_files(directory)[1]
+    file_list = ", ".join(f"'{f}'" for f in files)
+    return (
+        f"read_parquet([{file_list}], "
+        f"hive_partitioning = true, "
+        f"hive_types = {{'TAHUN': INTEGER, 'MONTH': INTEGER}}, "
+        f"union_by_name = true)"
+    )
+
+
+def dataset_version(directory, snapshot=None):
+    # token versi dataset untuk key cache: generation manifest + fingerprint
+    # file parquet (path, ukuran, mtime). Berubah saat append / replace / reset /
+    # compaction, cukup stat file tanpa membaca isinya.
+    # snapshot = (generation, files) yang di-pin pembaca; default snapshot terkini
+    directory = Path(directory)
+    generation, files = snapshot or snapshot_files(directory)
+    digest = hashlib.sha1()
+    digest.update(str(generation).encode())
+    for f in files:
+        try:
+            stat = f.stat()
+        except FileNotFoundError:
+            continue
+        digest.update(
+            f"{f.relative_to(directory).as_posix()}|{stat.st_size}|{stat.st_mtime_ns}\n".encode()
+        )
+    return digest.hexdigest()[:16]
+
+
+# =========================
+# SNAPSHOT (ISOLASI PEMBACA)
+# =========================
+# Penulis: file baru ditulis ke nama baru (tmp → rename), lalu 1 commit manifest
+# menambah file baru + memensiunkan file lama. Pembaca: pin (generation, daftar
+# file) sekali per rerun → seluruh rerun melihat data yang konsisten tanpa lock.
+def _scan_parts(directory):
+    return sorted(f.relative_to(directory).as_posix() for f in Path(directory).glob(PARTITION_GLOB))
+
+
+def snapshot_files(directory):
+    # (generation, [Path, ...]) snapshot terkini; dataset lama → snapshot dari isi folder
+    directory = Path(directory)
+    generation, parts = manifest.snapshot(directory.name)
+    if parts is None:
+        generation, parts = manifest.commit_snapshot(directory.name, initial=_scan_parts(directory))
+    return generation, [directory / p for p in parts]
+
+
+def _rel(directory, part):
+    # Path di dalam directory atau relpath "TAHUN=.../MONTH=.../x.parquet"
+    try:
+        return Path(part).relative_to(directory).as_posix()
+    except ValueError:
+        return Path(part).as_posix()
+
+
+def commit_parts(directory, added=(), removed=()):
+    directory = Path(directory)
+    result = manifest.commit_snapshot(
+        directory.name,
+        added=[_rel(directory, p) for p in added],
+        removed=[_rel(directory, p) for p in removed],
+        initial=_scan_parts(directory),
+    )
+    gc_retired(directory)
+    return result
+
+
+def commit_rewrite(directory, added, removed):
+    # hasil tulis ulang dari snapshot usang → output dibuang, pemanggil mengulang
+    try:
+        commit_parts(directory, added=added, removed=removed)
+        return True
+    except manifest.StaleSnapshot:
+        for f in added:
+            (Path(directory) / _rel(directory, f)).unlink(missing_ok=True)
+        return False
+
+
+def reset_dataset(directory):
+    # ganti shutil.rmtree: pembaca yang masih jalan tetap membaca snapshot lamanya
+    directory = Path(directory)
+    manifest.reset(directory.name, initial=_scan_parts(directory))
+    gc_retired(directory)
+
+
+def _pin_path(directory, holder):
+    return SNAPSHOT_PIN_DIR / Path(directory).name / f"{holder}.pin"
+
+
+def pin_snapshot(directory, holder):
+    # lease per pembaca (session); diperbarui di setiap rerun.
+    # Baca snapshot + tulis pin di bawah lock manifest → gc_retired tidak bisa
+    # menghapus file snapshot ini di antara keduanya
+    with manifest.locked():
+        generation, files = snapshot_files(directory)
+        path = _pin_path(directory, holder)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp.write_text(str(generation))
+        os.replace(tmp, path)
+    return generation, files
+
+
+def release_pin(directory, holder):
+    _pin_path(directory, holder).unlink(missing_ok=True)
+
+
+@contextmanager
+def pinned(directory, prefix):
+    # penulis yang membaca file snapshot (compaction / tulis ulang) ikut memegang
+    # pin → file inputnya tidak di-GC penulis lain sebelum selesai dibaca
+    holder = f"{prefix}-{uuid.uuid4().hex}"
+    pin_snapshot(directory, holder)
+    try:
+        yield holder
+    finally:
+        release_pin(directory, holder)
+        # file yang dipensiunkan selama pin ini dipegang
+        gc_retired(directory)
+
+
+def active_pins(directory):
+    # generation yang masih dipegang pembaca hidup; lease kedaluwarsa dibuang
+    pin_dir = SNAPSHOT_PIN_DIR / Path(directory).name
+    if not pin_dir.exists():
+        return []
+    cutoff = time.time() - PIN_TTL_SECONDS
+    generations = []
+    for f in pin_dir.glob("*.pin"):
+        try:
+            if f.stat().st_mtime < cutoff:
+                f.unlink(missing_ok=True)
+                continue
+            generations.append(int(f.read_text()))
+        except (FileNotFoundError, ValueError):
+            continue
+    return generations
+
+
+def gc_retired(directory):
+    # file pensiun di generation g hanya terlihat oleh snapshot < g →
+    # aman dihapus jika tidak ada pin hidup dengan generation < g
+    directory = Path(directory)
+    # cek pin + hapus di bawah lock yang sama dengan pin_snapshot
+    with manifest.locked():
+        retired = manifest.retired_parts(directory.name)
+        if not retired:
+            return 0
+        oldest_pin = min(active_pins(directory), default=None)
+        deletable = [
+            part for part, generation in retired.items()
+            if oldest_pin is None or oldest_pin >= generation
+        ]
+        for part in deletable:
+            path = directory / part
+            path.unlink(missing_ok=True)
+            # folder TAHUN=/MONTH= yang kosong ikut dibuang
+            for parent in [path.parent, path.parent.parent]:
+                try:
+                    if parent != directory and not any(parent.iterdir()):
+                        parent.rmdir()
+                except OSError:
+                    # sudah terhapus / baru diisi upload lain
+                    break
+        if deletable:
+            manifest.release_retired(directory.name, deletable)
+    return len(deletable)
+
+
+def partition_filter(periods):
+    # (TAHUN, MONTH) eksplisit → DuckDB bisa skip folder partisi yang tidak dipakai
+    clauses = [f'(TAHUN = {int(y)} AND "MONTH" = {int(m)})' for y, m in periods]
+    return "(" + " OR ".join(clauses) + ")" if clauses else "TRUE"
+
+
+def dataset_schema(dataset):
+    return SCHEMAS.get(dataset, {})
+
+
+def _source_columns(con, source):
+    return [
+        row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()
+    ]
+
+
+def _write_rejected(con, source, source_cols, dataset):
+    reject_dir = REJECT_DIR / dataset
+    reject_dir.mkdir(parents=True, exist_ok=True)
+    out = reject_dir / f"rejected-{uuid.uuid4().hex}.parquet"
+
+    n_rejected = con.execute(f"""
+        COPY ({rejected_select(source_cols, dataset_schema(dataset), source)})
+        TO '{out}' (FORMAT PARQUET)
+    """).fetchone()[0]
+
+    if not n_rejected:
+        out.unlink(missing_ok=True)
+    return n_rejected
+
+
+def write_source(con, source, directory, dataset=None):
+    # konversi tipe + validasi sekali di sini; baris gagal → side file.
+    # dataset (sales / target) default = nama folder tujuan
+    dataset = dataset or Path(directory).name
+    source_cols = _source_columns(con, source)
+    n_rejected = _write_rejected(con, source, source_cols, dataset)
+
+    n_rows = con.execute(f"""
+        COPY ({typed_select(source_cols, dataset_schema(dataset), source)})
+        TO '{directory}'
+        (
+            FORMAT PARQUET,
+            PARTITION_BY (TAHUN, "MONTH"),
+            APPEND,
+            FILENAME_PATTERN 'part-{{uuid}}'
+        )
+    """).fetchone()[0]
+    return n_rows, n_rejected
+
+
+def write_staged(con, source, directory):
+    # tulis ke folder staging sendiri lalu publish → daftar file milik penulis ini saja
+    # (bukan selisih isi folder, yang ikut memuat file penulis lain yang belum commit)
+    staging = STAGING_DIR / f"{Path(directory).name}-{uuid.uuid4().hex}"
+    staging.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        write_source(con, source, staging, dataset=Path(directory).name)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return publish_staging(staging, directory)
+
+
+# =========================
+# MIGRASI FILE FLAT LAMA
+# =========================
+def migrate_flat_parts(con, directory):
+    # file lama (part-<uuid>.parquet langsung di root folder) → pindah ke partisi
+    flat_files = sorted(Path(directory).glob("*.parquet"))
+    if not flat_files:
+        return 0
+
+    file_list = ", ".join(f"'{f}'" for f in flat_files)
+    added = write_staged(con, f"read_parquet([{file_list}], union_by_name = true)", directory)
+    commit_parts(directory, added=added)
+    # file flat tidak pernah masuk snapshot → langsung dihapus
+    for f in flat_files:
+        f.unlink(missing_ok=True)
+    return len(flat_files)
+
+
+def _file_types(con, files):
+    # {file: {kolom: tipe DuckDB}} dari metadata parquet (tanpa membaca data)
+    file_list = ", ".join(f"'{f}'" for f in files)
+    file_types = {}
+    for file_name, name, duckdb_type in con.execute(f"""
+        SELECT file_name, name, duckdb_type
+        FROM parquet_schema([{file_list}])
+        WHERE duckdb_type IS NOT NULL
+    """).fetchall():
+        file_types.setdefault(file_name, {})[name] = duckdb_type
+    return file_types
+
+
+def retype_legacy_parts(con, directory):
+    # fragment lama hasil SAFE MODE (semua kolom string) → tulis ulang bertipe
+    with pinned(directory, "retype"):
+        return _retype_legacy(con, directory)
+
+
+def _retype_legacy(con, directory):
+    for _ in range(COMMIT_RETRIES):
+        files = snapshot_files(directory)[1]
+        if not files:
+            return 0
+
+        file_types = _file_types(con, files)
+        schema = dataset_schema(Path(directory).name)
+        legacy = [f for f in files if needs_retype(file_types.get(str(f), {}), schema)]
+        if not legacy:
+            return 0
+
+        file_list = ", ".join(f"'{f}'" for f in legacy)
+        added = write_staged(
+            con,
+            f"read_parquet([{file_list}], hive_partitioning = false, union_by_name = true)",
+            directory
+        )
+        if commit_rewrite(directory, added, legacy):
+            return len(legacy)
+    return 0
+
+
+def canonicalize_parts(con, directory):
+    # part file sebelum canonicalization → tulis ulang (nama baru) + kolom _clean_*,
+    # sekali saja; file hasil ingest baru sudah membawanya
+    with pinned(directory, "canonical"):
+        for _ in range(COMMIT_RETRIES):
+            done = _canonicalize_once(con, directory)
+            if done is not None:
+                return done
+    return 0
+
+
+def _canonicalize_once(con, directory):
+    files = snapshot_files(directory)[1]
+    if not files:
+        return 0
+
+    file_types = _file_types(con, files)
+    added, removed = [], []
+    for f in files:
+        missing = missing_clean_cols(file_types.get(str(f), {}))
+        if not missing:
+            continue
+        extra = ", ".join(f"{clean_expr(quote(c))} AS {quote(clean_col(c))}" for c in missing)
+        staged = f.parent / f".canonical-{uuid.uuid4().hex}.tmp"
+        con.execute(f"""
+            COPY (
+                SELECT *, {extra}
+                FROM read_parquet('{f}', hive_partitioning = false)
+            )
+            TO '{staged}'
+            (FORMAT PARQUET, COMPRESSION ZSTD, ROW_GROUP_SIZE {COMPACT_ROW_GROUP_SIZE})
+        """)
+        final = f.parent / f"data-{uuid.uuid4().hex}.parquet"
+        os.replace(staged, final)
+        added.append(final)
+        removed.append(f)
+
+    if removed and not commit_rewrite(directory, added, removed):
+        return None
+    return len(removed)
+
+
+def publish_staging(staging_dir, directory):
+    # hasil tulis di folder staging → pindah ke partisi dataset (rename atomik per file).
+    # Belum terlihat pembaca sampai pemanggil commit_parts()
+    staging_dir = Path(staging_dir)
+    published = []
+    for f in sorted(staging_dir.glob(PARTITION_GLOB)):
+        rel = Path(f.parent.parent.name) / f.parent.name / f.name
+        (Path(directory) / rel).parent.mkdir(parents=True, exist_ok=True)
+        os.replace(f, Path(directory) / rel)
+        published.append(rel.as_posix())
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    return published
+
+
+def discard_uncommitted(directory, parts):
+    # parts hasil publish_staging yang gagal di-commit: tidak di snapshot, tidak di
+    # retired → GC tidak pernah menghapusnya
+    directory = Path(directory)
+    live = set(snapshot_files(directory)[1])
+    for part in parts:
+        path = directory / _rel(directory, part)
+        if path not in live:
+            path.unlink(missing_ok=True)
+
+
+def delete_source(con, directory, source_file, entry, keep=()):
+    # hapus baris 1 file sumber saja (re-upload file yang berubah):
+    # fragment miliknya dipensiunkan, file campuran ditulis ulang (nama baru) tanpa barisnya.
+    # Return (added, removed) → dimasukkan ke commit_parts() oleh pemanggil
+    directory = Path(directory)
+    keep = {Path(directory) / k for k in keep}
+    live = [f for f in snapshot_files(directory)[1] if f not in keep]
+    own_parts = {directory / p for p in entry.get("parts", [])}
+
+    removed = [f for f in live if f in own_parts]
+    added = []
+
+    # file lain yang masih memuat baris sumber ini (hasil compaction / data lama)
+    # → cukup scan kolom _source_file
+    others = [f for f in live if f not in own_parts]
+    if not others:
+        return added, removed
+    file_list = ", ".join(f"'{f}'" for f in others)
+    mixed = [
+        Path(row[0]) for row in con.execute(
+            f"""
+            SELECT DISTINCT filename
+            FROM read_parquet([{file_list}], filename = true, hive_partitioning = false, union_by_name = true)
+            WHERE _source_file = ?
+            """,
+            [source_file]
+        ).fetchall()
+    ]
+
+    for f in mixed:
+        staged = f.parent / f".rewrite-{uuid.uuid4().hex}.tmp"
+        con.execute(
+            f"""
+            COPY (
+                SELECT * FROM read_parquet('{f}', hive_partitioning = false)
+                WHERE _source_file IS DISTINCT FROM ?
+            )
+            TO '{staged}'
+            (FORMAT PARQUET, COMPRESSION ZSTD, ROW_GROUP_SIZE {COMPACT_ROW_GROUP_SIZE})
+            """,
+            [source_file]
+        )
+        # nama baru (bukan overwrite) → pembaca snapshot lama tetap membaca file aslinya
+        final = f.parent / f"data-{uuid.uuid4().hex}.parquet"
+        os.replace(staged, final)
+        added.append(final)
+        removed.append(f)
+    return added, removed
+
+
+def _files_by_partition(directory):
+    groups = {}
+    for f in snapshot_files(directory)[1]:
+        groups.setdefault(f.parent, []).append(f)
+    return groups
+
+
+def needs_compaction(directory, min_files=COMPACT_MIN_FILES):
+    return any(
+        len(files) >= min_files
+        for files in _files_by_partition(directory).values()
+    )
+
+
+# =========================
+# COMPACTION
+# =========================
+def compact_partition(con, directory, part_dir, files):
+    files = sorted(files)
+    if len(files) < 2:
+        return 0
+
+    file_list = ", ".join(f"'{f}'" for f in files)
+    staged = part_dir / f".compact-{uuid.uuid4().hex}.tmp"
+    final = part_dir / f"data-{uuid.uuid4().hex}.parquet"
+
+    con.execute(f"""
+        COPY (
+            SELECT * FROM read_parquet([{file_list}], hive_partitioning = false, union_by_name = true)
+        )
+        TO '{staged}'
+        (
+            FORMAT PARQUET,
+            COMPRESSION ZSTD,
+            ROW_GROUP_SIZE {COMPACT_ROW_GROUP_SIZE}
+        )
+    """)
+
+    # swap: file baru masuk via rename atomik + 1 commit snapshot; fragment lama
+    # dipensiunkan (dihapus setelah tidak ada pembaca). Fragment yang ditulis
+    # selama compaction berjalan tidak ikut. Input sudah diganti penulis lain
+    # (mis. upload ulang) → hasil dibuang, None = ulang dari snapshot terbaru
+    os.replace(staged, final)
+    if not commit_rewrite(directory, [final], files):
+        return None
+    return len(files)
+
+
+def compact_dataset(con, directory, min_files=2):
+    directory = Path(directory)
+    with _compaction_lock:
+        if directory in _compaction_running:
+            return 0
+        _compaction_running.add(directory)
+
+    try:
+        with pinned(directory, "compaction"):
+            return _compact_partitions(con, directory, min_files)
+    finally:
+        with _compaction_lock:
+            _compaction_running.discard(directory)
+
+
+def _compact_partitions(con, directory, min_files):
+    merged = 0
+    for part_dir in sorted(_files_by_partition(directory)):
+        # input usang (file sudah diganti penulis lain) → hasil dibuang, baca ulang snapshot
+        for _ in range(COMMIT_RETRIES):
+            files = _files_by_partition(directory).get(part_dir, [])
+            if len(files) < min_files:
+                break
+            done = compact_partition(con, directory, part_dir, files)
+            if done is not None:
+                merged += done
+                break
+    return merged
+
+
+def start_background_compaction(engine, directory, min_files=2):
+    def run():
+        con = engine.cursor()
+        try:
+            if compact_dataset(con, directory, min_files=min_files):
+                engine.refresh()
+        finally:
+            con.close()
+
+    t = threading.Thread(target=run, name=f"compact-{Path(directory).name}", daemon=True)
+    t.start()
+    return t
@@ -0,0 +1,115 @@
+import os
+import uuid
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+import rollup
+from schemas import clean_col
+
+# =========================
+# DIMENSION DICTIONARY (SIDECAR)
+# =========================
+# Nilai unik kolom filter Analytics (kolom kanonik _clean_*) + daftar TAHUN,
+# dibangun 1 pass dari rollup bulanan setiap kali data berubah.
+# data/dimensions/sales.parquet → kolom (dim, val)
+DIM_FILE = Path("data/dimensions/sales.parquet")
+
+# kombinasi unik kolom filter → opsi filter bertingkat (cascading)
+CUBE_FILE = Path("data/dimensions/sales_cube.parquet")
+
+FILTER_COLS = rollup.DIM_COLS
+
+
+def dictionary_select(source):
+    # UNPIVOT: 1 scan untuk semua kolom; nilai NULL otomatis dibuang
+    cols = [f'"{clean_col(c)}" AS "{c}"' for c in FILTER_COLS]
+    cols.append("CAST(TAHUN AS VARCHAR) AS TAHUN")
+    return f"""
+        SELECT DISTINCT dim, val
+        FROM (
+            UNPIVOT (SELECT {", ".join(cols)} FROM {source})
+            ON COLUMNS(*)
+            INTO NAME dim VALUE val
+        )
+        ORDER BY dim, val
+    """
+
+
+def cube_select(source):
+    cols = ", ".join(f'"{clean_col(c)}" AS "{c}"' for c in FILTER_COLS)
+    return f"SELECT DISTINCT {cols} FROM {source}"
+
+
+def _write_atomic(con, select_sql, out):
+    out.parent.mkdir(parents=True, exist_ok=True)
+    staged = out.parent / f".{out.stem}-{uuid.uuid4().hex}.tmp"
+    con.execute(f"COPY ({select_sql}) TO '{staged}' (FORMAT PARQUET)")
+    os.replace(staged, out)
+
+
+def _is_stale():
+    # rollup bulanan berubah (ingest / replace / reset) → mtime folder ikut berubah
+    if not DIM_FILE.exists() or not CUBE_FILE.exists():
+        return True
+    directory = rollup.rollup_dir("sales_monthly")
+    if not directory.exists():
+        return True
+    built = min(DIM_FILE.stat().st_mtime, CUBE_FILE.stat().st_mtime)
+    return any(
+        p.stat().st_mtime > built
+        for p in [directory, *directory.glob("*.parquet")]
+    )
+
+
+def refresh_dictionary(con, table="sales_monthly"):
+    # dipanggil dari refresh engine setelah tabel rollup didaftarkan
+    has_table = con.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [table]
+    ).fetchone()[0]
+    if not has_table:
+        DIM_FILE.unlink(missing_ok=True)
+        CUBE_FILE.unlink(missing_ok=True)
+        return False
+    if not _is_stale():
+        return False
+
+    _write_atomic(con, cube_select(table), CUBE_FILE)
+    _write_atomic(con, dictionary_select(table), DIM_FILE)
+    return True
+
+
+def sidecar_version():
+    # mtime file sidecar → ikut key cache (file dibangun ulang sesudah ingest selesai)
+    return tuple(
+        f.stat().st_mtime_ns if f.exists() else None
+        for f in (DIM_FILE, CUBE_FILE)
+    )
+
+
+def load_dictionary():
+    # {dim: [nilai, ...]} dari file sidecar (beberapa KB)
+    if not DIM_FILE.exists():
+        return {}
+    rows = duckdb.sql(f"SELECT dim, val FROM read_parquet('{DIM_FILE}')").fetchall()
+    values = {}
+    for dim, val in rows:
+        values.setdefault(dim, []).append(val)
+    return {dim: sorted(vals) for dim, vals in values.items()}
+
+
+def load_cube():
+    if not CUBE_FILE.exists():
+        return pd.DataFrame(columns=FILTER_COLS)
+    return pd.read_parquet(CUBE_FILE)
+
+
+def cascade_options(cube, selections, col):
+    # opsi kolom `col` = nilai yang masih punya kombinasi dengan pilihan di kolom lain
+    # (pilihan di kolom itu sendiri tidak mempersempit opsinya)
+    mask = pd.Series(True, index=cube.index)
+    for other, vals in selections.items():
+        if other != col and vals:
+            mask &= cube[other].isin(vals)
+    return sorted(cube.loc[mask, col].dropna().unique().tolist())
@@ -0,0 +1,84 @@
+import hashlib
+import os
+import time
+import uuid
+from contextlib import nullcontext
+from pathlib import Path
+
+# =========================
+# EXPORT DATASET (DOWNLOAD)
+# =========================
+# COPY DuckDB ditulis streaming ke disk (memori terbatas), terkompresi.
+# Artefak disimpan per (dataset, versi, cleaning, format) → download ulang
+# tidak menjalankan COPY lagi. File lama dibuang oleh gc_exports().
+EXPORT_DIR = Path("data/exports")
+
+# artefak yang tidak diakses selama ini dihapus
+EXPORT_TTL_SECONDS = 24 * 60 * 60
+
+# label UI → (ekstensi, opsi COPY, mime)
+EXPORT_FORMATS = {
+    "Parquet (recommended)": (
+        "parquet", "FORMAT PARQUET, COMPRESSION ZSTD", "application/vnd.apache.parquet"
+    ),
+    "CSV (gzip)": (
+        "csv.gz", "FORMAT CSV, HEADER, DELIMITER ',', COMPRESSION GZIP", "application/gzip"
+    ),
+}
+
+
+def export_path(view, version, cleaning, fmt):
+    ext = EXPORT_FORMATS[fmt][0]
+    key = hashlib.sha1(f"{view}|{version}|{cleaning}|{fmt}".encode("utf-8")).hexdigest()[:16]
+    return EXPORT_DIR / f"{view}-{key}.{ext}"
+
+
+def export_dataset(con, view, select_sql, version, cleaning, fmt, admit=nullcontext):
+    gc_exports()
+    out = export_path(view, version, cleaning, fmt)
+    if out.exists():
+        os.utime(out)  # artefak dipakai lagi → umur TTL diperpanjang
+        return out
+
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    staged = EXPORT_DIR / f".{out.name}-{uuid.uuid4().hex}.tmp"
+    try:
+        # admit: antrian query berat, hanya dipakai jika artefak belum ada
+        with admit():
+            con.execute(f"""
+                COPY (
+                    SELECT {select_sql}
+                    FROM {view}
+                )
+                TO '{staged}'
+                ({EXPORT_FORMATS[fmt][1]})
+            """)
+        os.replace(staged, out)
+    finally:
+        staged.unlink(missing_ok=True)
+    return out
+
+
+def export_mime(fmt):
+    return EXPORT_FORMATS[fmt][2]
+
+
+def read_export(path):
+    # dipanggil saat tombol download diklik (data callable), bukan di setiap rerun
+    return lambda: Path(path).read_bytes()
+
+
+def gc_exports(ttl_seconds=EXPORT_TTL_SECONDS):
+    # artefak kedaluwarsa + file .tmp sisa export yang gagal
+    if not EXPORT_DIR.exists():
+        return 0
+    cutoff = time.time() - ttl_seconds
+    removed = 0
+    for f in EXPORT_DIR.iterdir():
+        try:
+            if f.is_file() and f.stat().st_mtime < cutoff:
+                f.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
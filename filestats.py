@@ -0,0 +1,177 @@
+import os
+import threading
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+from datastore import dataset_schema, snapshot_files
+
+# =========================
+# STATISTIK PER PART FILE
+# =========================
+# data/stats/<dataset>.parquet → 1 baris per file parquet di dataset:
+# rows, value_sum, min/max TAHUN / MONTH / TANGGAL, jumlah SKU unik,
+# plus size + mtime untuk validasi (file ditulis ulang → stats dihitung ulang).
+# Metrik tab View dan pemilihan file per periode cukup membaca file ini.
+STATS_DIR = Path("data/stats")
+
+STATS_COLUMNS = [
+    "file", "size", "mtime_ns", "rows", "value_sum",
+    "tahun_min", "tahun_max", "month_min", "month_max",
+    "tanggal_min", "tanggal_max", "sku_count",
+]
+
+_lock = threading.Lock()
+
+
+def stats_path(dataset):
+    return STATS_DIR / f"{dataset}.parquet"
+
+
+def load_stats(dataset):
+    path = stats_path(dataset)
+    if not path.exists():
+        return pd.DataFrame(columns=STATS_COLUMNS)
+    return pd.read_parquet(path)
+
+
+def _save_stats(dataset, df):
+    STATS_DIR.mkdir(parents=True, exist_ok=True)
+    path = stats_path(dataset)
+    tmp = path.with_name(f".{path.stem}-{uuid.uuid4().hex}.tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _file_signatures(directory):
+    # hanya file di snapshot terkini (bukan file yang sedang ditulis / dipensiunkan)
+    signatures = {}
+    for f in snapshot_files(directory)[1]:
+        try:
+            stat = f.stat()
+        except FileNotFoundError:
+            continue
+        signatures[f.relative_to(directory).as_posix()] = (stat.st_size, stat.st_mtime_ns)
+    return signatures
+
+
+def compute_stats(con, directory, files):
+    # 1 scan untuk semua file baru, dikelompokkan per filename
+    directory = Path(directory)
+    schema = dataset_schema(directory.name)
+    tanggal = "TANGGAL" if "TANGGAL" in schema else "CAST(NULL AS DATE)"
+    sku = "SKU" if "SKU" in schema else "CAST(NULL AS VARCHAR)"
+
+    file_list = ", ".join(f"'{directory / f}'" for f in files)
+    df = con.execute(f"""
+        SELECT
+            filename,
+            COUNT(*)            AS rows,
+            SUM(Value)          AS value_sum,
+            MIN(TAHUN)          AS tahun_min,
+            MAX(TAHUN)          AS tahun_max,
+            MIN("MONTH")        AS month_min,
+            MAX("MONTH")        AS month_max,
+            MIN({tanggal})      AS tanggal_min,
+            MAX({tanggal})      AS tanggal_max,
+            COUNT(DISTINCT {sku}) AS sku_count
+        FROM read_parquet(
+            [{file_list}],
+            hive_partitioning = true,
+            hive_types = {{'TAHUN': INTEGER, 'MONTH': INTEGER}},
+            union_by_name = true,
+            filename = true
+        )
+        GROUP BY filename
+    """).df()
+    df["file"] = [Path(f).relative_to(directory).as_posix() for f in df.pop("filename")]
+
+    # file tanpa baris tetap dicatat (rows = 0)
+    empty = [f for f in files if f not in set(df["file"])]
+    if empty:
+        df = pd.concat([df, pd.DataFrame({"file": empty, "rows": 0})], ignore_index=True)
+    return df
+
+
+def sync_stats(con, directory):
+    # hanya file baru / berubah yang di-scan; file yang sudah hilang dibuang
+    directory = Path(directory)
+    dataset = directory.name
+    with _lock:
+        signatures = _file_signatures(directory)
+        stats = load_stats(dataset)
+
+        valid = pd.Series([
+            signatures.get(f) == (size, mtime)
+            for f, size, mtime in zip(stats["file"], stats["size"], stats["mtime_ns"])
+        ], index=stats.index, dtype=bool)
+        kept = stats[valid]
+        missing = sorted(set(signatures) - set(kept["file"]))
+        if not missing and len(kept) == len(stats):
+            return stats
+
+        if missing:
+            fresh = compute_stats(con, directory, missing)
+            fresh["size"] = [signatures[f][0] for f in fresh["file"]]
+            fresh["mtime_ns"] = [signatures[f][1] for f in fresh["file"]]
+            kept = fresh if kept.empty else pd.concat([kept, fresh], ignore_index=True)
+
+        stats = kept.reindex(columns=STATS_COLUMNS).reset_index(drop=True)
+        _save_stats(dataset, stats)
+        return stats
+
+
+def pinned_stats(con, directory, files=None):
+    # stats untuk snapshot yang di-pin rerun ini (files); None → snapshot terkini.
+    # File snapshot lama yang sudah diganti di snapshot terkini dihitung langsung
+    # (masih di-pin → belum di-GC), tidak masuk file stats
+    stats = sync_stats(con, directory)
+    if files is None:
+        return stats
+    directory = Path(directory)
+    pinned = {Path(f).relative_to(directory).as_posix() for f in files}
+    stats = stats[stats["file"].isin(pinned)]
+    missing = sorted(pinned - set(stats["file"]))
+    if missing:
+        fresh = compute_stats(con, directory, missing)
+        stats = fresh if stats.empty else pd.concat([stats, fresh], ignore_index=True)
+    return stats.reset_index(drop=True)
+
+
+def dataset_totals(con, directory, files=None):
+    # metrik tab View: total baris + total Value tanpa membaca data
+    stats = pinned_stats(con, directory, files)
+    total_rows = int(stats["rows"].sum()) if len(stats) else 0
+    total_value = stats["value_sum"].sum(min_count=1) if len(stats) else None
+    return total_rows, (None if pd.isna(total_value) else float(total_value))
+
+
+# =========================
+# FILE PRUNING PER PERIODE
+# =========================
+def files_for_periods(con, directory, periods, files=None):
+    # file yang rentang (TAHUN, MONTH)-nya mencakup salah satu periode
+    stats = pinned_stats(con, directory, files)
+    if not len(stats):
+        return []
+    lo = stats["tahun_min"] * 12 + stats["month_min"]
+    hi = stats["tahun_max"] * 12 + stats["month_max"]
+    mask = pd.Series(False, index=stats.index)
+    for y, m in periods:
+        key = int(y) * 12 + int(m)
+        mask |= (lo <= key) & (hi >= key)
+    return [Path(directory) / f for f in sorted(stats.loc[mask, "file"])]
+
+
+def pruned_source(con, directory, periods, fallback, files=None):
+    # read_parquet atas file yang relevan saja; tidak ada file → relasi kosong.
+    # files = snapshot yang di-pin rerun ini → pivot dan target dari generation yang sama
+    files = files_for_periods(con, directory, periods, files)
+    if not files:
+        return f"(SELECT * FROM {fallback} WHERE FALSE)"
+    file_list = ", ".join(f"'{f}'" for f in files)
+    return (
+        f"read_parquet([{file_list}], hive_partitioning = true, "
+        f"hive_types = {{'TAHUN': INTEGER, 'MONTH': INTEGER}}, union_by_name = true)"
+    )
@@ -0,0 +1,215 @@
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import streamlit as st
+
+# =========================
+# RESOURCE GOVERNOR
+# =========================
+# Semua session berbagi 1 proses Streamlit + 1 database DuckDB. Batas memori,
+# thread dan folder spill dipasang per database DuckDB (memory_limit / threads
+# DuckDB berlaku untuk seluruh database, bukan per cursor). Query berat
+# (summary, export) lewat antrian: maksimal MAX_RUNNING jalan bersamaan →
+# tiap query mendapat ± MEMORY_LIMIT / MAX_RUNNING. Lebih dari MAX_WAITING
+# yang menunggu → ditolak "server sibuk", bukan membuat server kehabisan RAM.
+#
+# Konfigurasi lewat environment variable:
+#   SALES_DUCKDB_MEMORY_LIMIT   contoh "8GB"    (default: 50% RAM)
+#   SALES_DUCKDB_THREADS        contoh "8"      (default: jumlah CPU)
+#   SALES_DUCKDB_TEMP_DIR       folder spill    (default: data/spill)
+#   SALES_DUCKDB_MAX_TEMP_SIZE  contoh "50GB"   (default: batas DuckDB)
+#   SALES_QUERY_MAX_RUNNING     query berat bersamaan (default: 2)
+#   SALES_QUERY_MAX_WAITING     panjang antrian        (default: 8)
+#   SALES_QUERY_WAIT_TIMEOUT    detik menunggu giliran (default: 300)
+ENV_PREFIX = "SALES_"
+
+# memory_limit default = porsi RAM fisik (DuckDB sendiri default 80%)
+DEFAULT_MEMORY_FRACTION = 0.5
+
+# interval update status "menunggu giliran" di UI
+WAIT_POLL_SECONDS = 0.5
+
+_UNITS = {"B": 1, "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3, "TB": 1000 ** 4,
+          "KIB": 1024, "MIB": 1024 ** 2, "GIB": 1024 ** 3, "TIB": 1024 ** 4}
+
+
+def _env(name, default):
+    value = os.environ.get(ENV_PREFIX + name, "").strip()
+    return value or default
+
+
+def parse_bytes(value):
+    # "4GB" / "512 MiB" / "1073741824" → byte
+    match = re.fullmatch(r"\s*([\d.]+)\s*([A-Za-z]*)\s*", str(value))
+    if not match or match.group(2).upper() not in _UNITS | {"": 1}:
+        raise ValueError(f"Ukuran memori tidak dikenal: {value}")
+    return int(float(match.group(1)) * _UNITS.get(match.group(2).upper(), 1))
+
+
+def format_bytes(n):
+    return f"{max(int(n) // 1024 ** 2, 1)}MiB"
+
+
+def _physical_memory():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def memory_limit():
+    # byte; None → default DuckDB
+    value = _env("DUCKDB_MEMORY_LIMIT", None)
+    if value:
+        return parse_bytes(value)
+    total = _physical_memory()
+    return int(total * DEFAULT_MEMORY_FRACTION) if total else None
+
+
+def thread_limit():
+    return max(1, int(_env("DUCKDB_THREADS", os.cpu_count() or 1)))
+
+
+def temp_dir():
+    return Path(_env("DUCKDB_TEMP_DIR", "data/spill"))
+
+
+def max_running():
+    return max(1, int(_env("QUERY_MAX_RUNNING", 2)))
+
+
+def max_waiting():
+    return max(0, int(_env("QUERY_MAX_WAITING", 8)))
+
+
+def wait_timeout():
+    return float(_env("QUERY_WAIT_TIMEOUT", 300))
+
+
+# =========================
+# BATAS PER DATABASE DUCKDB
+# =========================
+def configure(con, share=1):
+    # share > 1 → database ini hanya mendapat 1/share dari budget
+    # (mis. worker ingest paralel, koneksi per session)
+    limit = memory_limit()
+    if limit:
+        con.execute(f"SET memory_limit = '{format_bytes(limit / share)}'")
+    con.execute(f"SET threads = {max(1, thread_limit() // share)}")
+
+    # folder spill sendiri per database → file temp antar proses tidak bentrok
+    spill = temp_dir() / f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    spill.parent.mkdir(parents=True, exist_ok=True)
+    con.execute(f"SET temp_directory = '{spill.as_posix()}'")
+    max_temp = _env("DUCKDB_MAX_TEMP_SIZE", None)
+    if max_temp:
+        con.execute(f"SET max_temp_directory_size = '{format_bytes(parse_bytes(max_temp))}'")
+    return con
+
+
+# =========================
+# ANTRIAN QUERY BERAT
+# =========================
+class ServerBusy(RuntimeError):
+    pass
+
+
+class AdmissionQueue:
+    # FIFO: maksimal max_running query jalan, maksimal max_waiting menunggu
+
+    def __init__(self, running=None, waiting=None):
+        self.max_running = running or max_running()
+        self.max_waiting = max_waiting() if waiting is None else waiting
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = []
+
+    def status(self):
+        with self._cond:
+            return self._running, len(self._waiting)
+
+    def _try_enter(self, ticket):
+        # dipanggil dengan lock terpegang
+        if self._running < self.max_running and (not self._waiting or self._waiting[0] is ticket):
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+            self._running += 1
+            return True
+        return False
+
+    @contextmanager
+    def admit(self, on_wait=None, timeout=None):
+        # on_wait(posisi antrian, detik menunggu) dipanggil berkala di luar lock
+        timeout = wait_timeout() if timeout is None else timeout
+        ticket = object()
+        started = time.monotonic()
+
+        with self._cond:
+            admitted = self._try_enter(ticket)
+            if not admitted:
+                if len(self._waiting) >= self.max_waiting:
+                    raise ServerBusy(
+                        f"{self._running} query berjalan, {len(self._waiting)} menunggu"
+                    )
+                self._waiting.append(ticket)
+
+        try:
+            while not admitted:
+                waited = time.monotonic() - started
+                if waited > timeout:
+                    raise ServerBusy(f"menunggu giliran lebih dari {timeout:.0f} detik")
+                with self._cond:
+                    admitted = self._try_enter(ticket)
+                    position = self._waiting.index(ticket) + 1 if not admitted else 0
+                    if not admitted:
+                        self._cond.wait(WAIT_POLL_SECONDS)
+                if not admitted and on_wait:
+                    on_wait(position, waited)
+        except BaseException:
+            with self._cond:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                self._cond.notify_all()
+            raise
+
+        try:
+            yield time.monotonic() - started
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+
+# =========================
+# API HALAMAN STREAMLIT
+# =========================
+@st.cache_resource
+def shared_queue():
+    # 1 antrian untuk seluruh proses: halaman Sales dan LDGT, semua session
+    return AdmissionQueue()
+
+
+@contextmanager
+def heavy_query(queue, label):
+    # status antrian terlihat selama menunggu; antrian penuh → pesan + rerun berhenti
+    placeholder = st.empty()
+
+    def show_wait(position, waited):
+        running, waiting = queue.status()
+        placeholder.info(
+            f"⏳ {label}: menunggu giliran — antrian ke-{position} dari {waiting} · "
+            f"{running}/{queue.max_running} query berat berjalan · {waited:,.0f} detik"
+        )
+
+    try:
+        with queue.admit(on_wait=show_wait):
+            placeholder.empty()
+            yield
+    except ServerBusy as e:
+        placeholder.warning(f"🚦 Server sedang sibuk ({e}). Coba lagi beberapa saat lagi.")
+        st.stop()
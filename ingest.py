@@ -0,0 +1,315 @@
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import datastore
+import filestats
+import governor
+import manifest
+import rollup
+
+# jumlah baris Excel per batch → 1 row group di file staging
+XLSX_BATCH_ROWS = 50_000
+
+# ukuran chunk saat menyalin upload ke disk
+SPOOL_CHUNK_BYTES = 8 * 1024 * 1024
+
+# interval polling progress worker (detik)
+PROGRESS_POLL_SECONDS = 0.3
+
+
+# =========================
+# HELPER
+# =========================
+def sql_str(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def excel_sheet_names(uploaded):
+    # xlsx: cukup baca daftar sheet (read-only), tanpa load isi workbook
+    if uploaded.name.lower().endswith("xlsx"):
+        from openpyxl import load_workbook
+        wb = load_workbook(uploaded, read_only=True)
+        try:
+            return wb.sheetnames
+        finally:
+            wb.close()
+            uploaded.seek(0)
+    return pd.ExcelFile(uploaded).sheet_names
+
+
+def spool_upload(uploaded, directory):
+    # salin upload ke file sementara per chunk → DuckDB bisa baca langsung dari disk.
+    # sha256 dihitung sekalian untuk manifest (deteksi upload ulang)
+    uploaded.seek(0)
+    out = Path(directory) / Path(uploaded.name).name
+    digest = hashlib.sha256()
+    with open(out, "wb") as f:
+        while chunk := uploaded.read(SPOOL_CHUNK_BYTES):
+            digest.update(chunk)
+            f.write(chunk)
+    uploaded.seek(0)
+    return out, digest.hexdigest()
+
+
+def commit_ingest(con, name, sha256, res, directory):
+    # publish hasil staging + catat di manifest. File dengan nama sama tapi isi
+    # berubah → hanya baris milik file itu yang diganti.
+    dataset = Path(directory).name
+    old = manifest.get_entry(dataset, name)
+    parts = datastore.publish_staging(res["staging"], directory)
+    # 1 commit snapshot: baris baru + penggantinya terlihat bersamaan oleh pembaca.
+    # File lama sempat diganti compaction → hapus baris lama diulang di snapshot baru
+    # pin selama delete_source membaca file campuran → tidak di-GC penulis lain
+    try:
+        with datastore.pinned(directory, "ingest"):
+            for attempt in range(datastore.COMMIT_RETRIES):
+                added, removed = [], []
+                if old is not None:
+                    added, removed = datastore.delete_source(con, directory, name, old, keep=parts)
+                try:
+                    datastore.commit_parts(directory, added=parts + added, removed=removed)
+                    break
+                except manifest.StaleSnapshot:
+                    # hanya file tulis ulang yang dibuang; parts upload dipakai lagi di percobaan berikut
+                    for f in added:
+                        Path(f).unlink(missing_ok=True)
+                    if attempt == datastore.COMMIT_RETRIES - 1:
+                        raise
+    except Exception:
+        datastore.discard_uncommitted(directory, parts)
+        raise
+    if dataset == "sales" and rollup.rollups_built():
+        rollup.write_source_rollup(
+            con, name, [Path(directory) / p for p in parts], replace=old is not None
+        )
+    manifest.record_ingest(dataset, name, sha256, res["rows"], res["rejected"], parts)
+    filestats.sync_stats(con, directory)
+    return "replaced" if old is not None else "added"
+
+
+def _header_names(row):
+    names, seen = [], {}
+    for i, v in enumerate(row):
+        name = str(v).strip() if v is not None else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def stage_xlsx(path, sheet, out_path, batch_rows=XLSX_BATCH_ROWS, on_rows=None):
+    # openpyxl read-only: baris dibaca satu per satu, ditulis per row group
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet]
+        total_rows = ws.max_row or 0
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return 0
+
+        names = _header_names(header)
+        schema = pa.schema([(n, pa.string()) for n in names])
+        n_rows = 0
+
+        with pq.ParquetWriter(out_path, schema) as writer:
+            batch = [[] for _ in names]
+            for row in rows:
+                if row is None or all(v is None for v in row):
+                    continue
+                for i in range(len(names)):
+                    v = row[i] if i < len(row) else None
+                    batch[i].append(None if v is None else str(v))
+                if len(batch[0]) >= batch_rows:
+                    writer.write_table(pa.Table.from_arrays(batch, schema=schema))
+                    n_rows += len(batch[0])
+                    batch = [[] for _ in names]
+                    if on_rows:
+                        on_rows(n_rows, total_rows)
+
+            if batch[0] or n_rows == 0:
+                writer.write_table(pa.Table.from_arrays(batch, schema=schema))
+                n_rows += len(batch[0])
+        return n_rows
+    finally:
+        wb.close()
+
+
+def with_metadata(con, reader, source_file, data_type):
+    # kolom metadata ditimpa jika file upload sudah membawanya (mis. hasil export)
+    meta_cols = {
+        "_source_file": sql_str(source_file),
+        "_data_type": sql_str(data_type.lower()),
+    }
+    existing = {
+        row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {reader}").fetchall()
+    }
+    replace = [f"{v} AS {k}" for k, v in meta_cols.items() if k in existing]
+    append = [f"{v} AS {k}" for k, v in meta_cols.items() if k not in existing]
+
+    star = f"* REPLACE ({', '.join(replace)})" if replace else "*"
+    return f"(SELECT {', '.join([star] + append)} FROM {reader})"
+
+
+# =========================
+# INGEST 1 FILE (STREAMING)
+# =========================
+def ingest_path(path, meta, directory, data_type, progress=None, key=None, share=1):
+    # pipeline 1 file: read → typed / validasi → parquet partisi.
+    # Bisa jalan di proses worker: output ditulis ke folder staging sendiri,
+    # dipublish ke dataset oleh pemanggil setelah sukses.
+    def report(fraction, status):
+        if progress is not None:
+            progress[key] = (fraction, status)
+
+    path = Path(path)
+    dataset = Path(directory).name
+    staging = datastore.STAGING_DIR / f"{dataset}-{uuid.uuid4().hex}"
+    staging.parent.mkdir(parents=True, exist_ok=True)
+    # share = jumlah worker paralel → memori / thread dibagi rata
+    con = governor.configure(duckdb.connect(), share)
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="ingest-") as tmp:
+            report(0.05, "membaca")
+            registered = None
+
+            if meta["type"] == "parquet":
+                reader = f"read_parquet({sql_str(path)})"
+
+            elif meta["type"] == "csv":
+                reader = (
+                    f"read_csv({sql_str(path)}, delim = {sql_str(meta['delimiter'])}, "
+                    f"header = true, all_varchar = true)"
+                )
+
+            elif path.suffix.lower() == ".xlsx":
+                staged = Path(tmp) / "staged.parquet"
+                stage_xlsx(
+                    path, meta["sheet"], staged,
+                    on_rows=lambda n, total: report(
+                        0.05 + 0.45 * min(n / max(total, 1), 1), f"membaca {n:,} baris"
+                    )
+                )
+                reader = f"read_parquet({sql_str(staged)})"
+
+            else:
+                # xls / xlsb tidak punya row iterator read-only → fallback pandas
+                df = pd.read_excel(path, sheet_name=meta["sheet"], dtype=str)
+                registered = reader = "_upload_excel"
+                con.register(registered, df)
+
+            report(0.5, "validasi & tulis parquet")
+            n_rows, n_rejected = datastore.write_source(
+                con,
+                with_metadata(con, reader, meta["name"], data_type),
+                staging,
+                dataset=dataset
+            )
+            if registered:
+                con.unregister(registered)
+
+        report(0.9, "publish")
+        return {"staging": str(staging), "rows": n_rows, "rejected": n_rejected}
+
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    finally:
+        con.close()
+
+
+# =========================
+# INGEST BANYAK FILE (PROCESS POOL)
+# =========================
+def ingest_parallel(con, files, directory, data_type, on_progress=None, max_workers=None):
+    # files: {nama: meta upload}. Tiap file diproses di worker terpisah;
+    # gagal di 1 file tidak membatalkan file lain.
+    results = {
+        name: {"rows": 0, "rejected": 0, "error": None, "status": None}
+        for name in files
+    }
+    if not files:
+        return results
+
+    max_workers = max_workers or min(len(files), os.cpu_count() or 1)
+
+    def notify(name, fraction, status):
+        if on_progress:
+            on_progress(name, fraction, status)
+
+    with tempfile.TemporaryDirectory(prefix="spool-") as tmp:
+        jobs = {}
+        hashes = {}
+        for i, (name, meta) in enumerate(files.items()):
+            notify(name, 0.0, "antri")
+            # UploadedFile tidak bisa dikirim ke proses lain → simpan dulu ke disk
+            spool_dir = Path(tmp) / str(i)
+            spool_dir.mkdir()
+            path, sha256 = spool_upload(meta["file"], spool_dir)
+
+            # isi identik sudah pernah di-ingest → lewati
+            existing = manifest.find_by_hash(Path(directory).name, sha256)
+            if existing is not None or sha256 in hashes.values():
+                results[name]["status"] = "skipped"
+                notify(name, 1.0, f"dilewati (isi sama dengan {existing or 'file lain'})")
+                continue
+
+            hashes[name] = sha256
+            job = {k: v for k, v in meta.items() if k != "file"}
+            job["name"] = name
+            jobs[name] = (path, job)
+
+        if not jobs:
+            return results
+
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Manager() as manager, ProcessPoolExecutor(max_workers, mp_context=ctx) as pool:
+            progress = manager.dict()
+            futures = {
+                pool.submit(ingest_path, path, job, directory, data_type, progress, name, max_workers): name
+                for name, (path, job) in jobs.items()
+            }
+
+            pending = set(futures)
+            while pending:
+                for fut in [f for f in pending if f.done()]:
+                    pending.discard(fut)
+                    name = futures[fut]
+                    try:
+                        res = fut.result()
+                        status = commit_ingest(con, name, hashes[name], res, directory)
+                        results[name].update(
+                            rows=res["rows"], rejected=res["rejected"], status=status
+                        )
+                        notify(name, 1.0, "selesai" if status == "added" else "selesai (mengganti versi lama)")
+                    except Exception as e:
+                        results[name]["error"] = str(e)
+                        notify(name, 1.0, "gagal")
+
+                for fut in pending:
+                    name = futures[fut]
+                    fraction, status = progress.get(name, (0.0, "antri"))
+                    notify(name, fraction, status)
+
+                if pending:
+                    time.sleep(PROGRESS_POLL_SECONDS)
+
+    return results
@@ -0,0 +1,20 @@
+# =========================
+# KALENDER ISO WEEK
+# =========================
+# Month ISO = bulan hari Kamis minggu itu, WEEK_IN_MONTH = urutan minggu di
+# Month ISO tsb. Dihitung langsung di SQL rollup dari (TAHUN, WEEK), tanpa tabel.
+
+
+def thursday_expr(iso_year, iso_week):
+    # Kamis minggu ISO: 4 Januari selalu di minggu 1
+    jan4 = f"make_date({iso_year}, 1, 4)"
+    return f"({jan4} - CAST(isodow({jan4}) - 1 AS INTEGER) + 7 * ({iso_week} - 1) + 3)"
+
+
+def month_iso_expr(iso_year, iso_week):
+    return f"CAST(EXTRACT(MONTH FROM {thursday_expr(iso_year, iso_week)}) AS INTEGER)"
+
+
+def week_in_month_expr(iso_year, iso_week):
+    # Kamis ke-n di bulannya = minggu ke-n di Month ISO
+    return f"CAST((EXTRACT(DAY FROM {thursday_expr(iso_year, iso_week)}) - 1) // 7 + 1 AS INTEGER)"
@@ -1,9 +1,14 @@
+import threading
 import streamlit as st
 import pandas as pd
 import pydeck as pdk
 import plotly.express as px
 import numpy as np
 from pathlib import Path
+import duckdb
+import datagrid
+import governor
+import profiling
 
 
 
@@ -13,6 +18,54 @@ def normalize_for_parquet(df):
             df[col] = df[col].astype(str)
     return df
 
+# =====================================================
+# LOOKUP CABANG → LAT/LON
+# =====================================================
+CABANG_LOOKUP = {
+    "Banda Aceh": (5.5483, 95.3238),
+    "Bengkulu": (-3.8000, 102.2650),
+    "Lampung": (-5.4296, 105.2620),
+    "Jambi": (-1.6100, 103.6100),
+    "Kotabumi": (-5.4547, 105.7716),
+    "Lhokseumawe": (5.1919, 97.1456),
+    "Medan": (3.5952, 98.6722),
+    "Metro": (-5.1156, 105.2983),
+    "Padang": (-0.9491, 100.3543),
+    "Palembang": (-2.9761, 104.7754),
+    "Pekanbaru": (0.5333, 101.4500),
+    "Pematang Siantar": (2.9639, 99.0621)
+}
+
+def aggregate_map(df):
+    # agregasi peta per CABANG × KET (dipakai tab Analytics dan bench/)
+    df = df.copy()
+    df['lat'] = df['CABANG'].map(lambda x: CABANG_LOOKUP.get(x, (None, None))[0])
+    df['lon'] = df['CABANG'].map(lambda x: CABANG_LOOKUP.get(x, (None, None))[1])
+    return (
+        df.dropna(subset=['lat', 'lon'])
+        .groupby(['CABANG', 'KET', 'lat', 'lon'], as_index=False)
+        .agg(
+            jumlah=('NET VALUE', 'count'),
+            total_value=('NET VALUE', 'sum')
+        )
+    )
+
+_ldgt_lock = threading.Lock()
+
+@st.cache_resource
+def get_ldgt_db():
+    # 1 database DuckDB in-memory untuk View Data LDGT seluruh proses (bukan 1 per
+    # session) → budget memori tetap porsi 1 query berat berapa pun jumlah session
+    return governor.configure(duckdb.connect(), governor.max_running())
+
+def get_ldgt_con():
+    # cursor per session (seperti SalesEngine.cursor): df session didaftarkan di
+    # cursor sendiri, ditutup bersama session_state saat session berakhir
+    if 'ldgt_con' not in st.session_state:
+        with _ldgt_lock:
+            st.session_state['ldgt_con'] = get_ldgt_db().cursor()
+    return st.session_state['ldgt_con']
+
 def ldgtmap():
     LDGT_DIR = Path("data/ldgt")
     LDGT_DIR.mkdir(parents=True, exist_ok=True)
@@ -22,15 +75,31 @@ def ldgtmap():
     
     st.title("LDGT Dashboard")
 
+    # profiling opt-in: catat langkah berat (load, normalisasi, filter, agregasi) di rerun ini
+    profiling.start_rerun("ldgt", st.sidebar.toggle("🩺 Profiling query", key="profiling_ldgt"))
+
     # =========================
-    # Buat 3 tabs
+    # LOAD DATA EXISTING (AUTO)
     # =========================
-    tab1, tab2, tab3 = st.tabs(["Upload Data", "View Data", "Analytics"])
+    # dimuat sekali per session di luar tab → tab mana pun yang dibuka pertama kali tetap punya data
+    if 'df' not in st.session_state:
+        with profiling.step("load parquet LDGT"):
+            if PARQUET_FILE.exists():
+                st.session_state['df'] = pd.read_parquet(PARQUET_FILE)
+                st.session_state['ldgt_loaded_from'] = "latest"
+            elif DEFAULT_PARQUET.exists():
+                st.session_state['df'] = pd.read_parquet(DEFAULT_PARQUET)
+                st.session_state['ldgt_loaded_from'] = "default"
+
+    # =========================
+    # Buat 3 tabs (lazy: hanya tab yang dibuka yang dijalankan)
+    # =========================
+    tabs = st.tabs(["Upload Data", "View Data", "Analytics"], key="ldgt_tab", on_change="rerun")
 
     # =========================
     # TAB 1: Upload File
     # =========================
-    with tab1:
+    def render_upload():
         st.markdown(
                                 f"""
                                 <style>
@@ -90,15 +159,13 @@ def ldgtmap():
             # LOAD DATA EXISTING (AUTO)
             # =========================
             if uploaded_file is None:
-                if 'df' not in st.session_state:
-                    if PARQUET_FILE.exists():
-                        st.session_state['df'] = pd.read_parquet(PARQUET_FILE)
-                        st.success("📦 Data terakhir berhasil dimuat (Parquet)")
-                    elif DEFAULT_PARQUET.exists():
-                        st.session_state['df'] = pd.read_parquet(DEFAULT_PARQUET)
-                        st.info("📂 Menggunakan data default")
-                    else:
-                        st.warning("Belum ada data tersimpan")
+                loaded_from = st.session_state.pop('ldgt_loaded_from', None)
+                if loaded_from == "latest":
+                    st.success("📦 Data terakhir berhasil dimuat (Parquet)")
+                elif loaded_from == "default":
+                    st.info("📂 Menggunakan data default")
+                elif 'df' not in st.session_state:
+                    st.warning("Belum ada data tersimpan")
 
             # =========================
             # PROSES FILE BARU
@@ -107,7 +174,7 @@ def ldgtmap():
                 st.write(f"📄 File dipilih: **{uploaded_file.name}**")
 
                 if st.button("🚀 Proses & Simpan", key="proses_ldgt"):
-                    with st.spinner("Memproses data..."):
+                    with st.spinner("Memproses data..."), profiling.step("baca & simpan upload LDGT"):
                         # baca file
                         if uploaded_file.name.endswith(".csv"):
                             df = pd.read_csv(uploaded_file)
@@ -134,7 +201,7 @@ def ldgtmap():
     # =========================
     # TAB 2: View Data
     # =========================0
-    with tab2:
+    def render_view():
         if 'df' in st.session_state:
             df = st.session_state['df']
             
@@ -188,13 +255,17 @@ def ldgtmap():
                     <p></p>
                     """, unsafe_allow_html=True
                 )
-            st.dataframe(df)
-
-            # Tombol Download CSV
-            csv_data = df.to_csv(index=False).encode('utf-8')
+            # df didaftarkan ke koneksi DuckDB session (zero-copy) → hanya 1 halaman dikirim ke browser.
+            # Query count + halaman lewat antrian query berat yang sama dengan halaman Sales
+            con = profiling.instrument(get_ldgt_con())
+            con.register("ldgt_df", df)
+            with governor.heavy_query(governor.shared_queue(), "View Data LDGT"):
+                datagrid.data_grid(con, "ldgt_df", key="grid_ldgt")
+
+            # Tombol Download CSV (CSV baru dibuat saat tombol diklik, bukan di setiap rerun)
             st.download_button(
                 label="📥 Download Data as CSV",
-                data=csv_data,
+                data=lambda: df.to_csv(index=False).encode('utf-8'),
                 file_name='Data Sales LDGT Resize.csv',
                 mime='text/csv'
             )
@@ -208,7 +279,7 @@ def ldgtmap():
     # =========================
     # TAB 3: Analytics - Mapping (PyDeck)
     # =========================
-    with tab3:
+    def render_analytics():
 
         st.markdown(
             """
@@ -237,16 +308,17 @@ def ldgtmap():
             st.info("Silakan upload file dulu di tab Upload Data.")
             st.stop()
 
-        df = st.session_state['df'].copy()
+        with profiling.step("copy + normalisasi df"):
+            df = st.session_state['df'].copy()
 
-        # =====================================================
-        # NORMALISASI DATA (ANTI ERROR)
-        # =====================================================
-        df['Tahun'] = pd.to_numeric(df['Thn'], errors='coerce')
-        df['Month'] = pd.to_numeric(df['MONTH'], errors='coerce')
-        df['NET VALUE'] = pd.to_numeric(df['NET VALUE'], errors='coerce')
+            # =====================================================
+            # NORMALISASI DATA (ANTI ERROR)
+            # =====================================================
+            df['Tahun'] = pd.to_numeric(df['Thn'], errors='coerce')
+            df['Month'] = pd.to_numeric(df['MONTH'], errors='coerce')
+            df['NET VALUE'] = pd.to_numeric(df['NET VALUE'], errors='coerce')
 
-        df = df.dropna(subset=['Tahun', 'Month'])
+            df = df.dropna(subset=['Tahun', 'Month'])
 
         # =====================================================
         # FILTER SECTION
@@ -257,10 +329,11 @@ def ldgtmap():
         colf4, colf5 = st.columns(2)
 
         # ---------- UNIQUE VALUES ----------
-        list_cabang = sorted(df['CABANG'].dropna().unique())
-        list_dist   = sorted(df['DISTRIBUTOR'].dropna().unique())
-        list_sku    = sorted(df['SKU'].dropna().unique())
-        list_ket   = sorted(df['KET'].dropna().unique())
+        with profiling.step("nilai unik filter"):
+            list_cabang = sorted(df['CABANG'].dropna().unique())
+            list_dist   = sorted(df['DISTRIBUTOR'].dropna().unique())
+            list_sku    = sorted(df['SKU'].dropna().unique())
+            list_ket   = sorted(df['KET'].dropna().unique())
 
         # ---------- MULTISELECT ----------
         with colf1:
@@ -297,51 +370,25 @@ def ldgtmap():
         # =====================================================
         # APPLY FILTER
         # =====================================================
-        df = df[
-            df['CABANG'].isin(f_cabang) &
-            df['DISTRIBUTOR'].isin(f_dist) &
-            df['SKU'].isin(f_sku) &
-            df['KET'].isin(f_ket) &
-            df['Tahun'].between(year_range[0], year_range[1]) &
-            df['Month'].between(month_range[0], month_range[1])
-        ]
+        with profiling.step("apply filter"):
+            df = df[
+                df['CABANG'].isin(f_cabang) &
+                df['DISTRIBUTOR'].isin(f_dist) &
+                df['SKU'].isin(f_sku) &
+                df['KET'].isin(f_ket) &
+                df['Tahun'].between(year_range[0], year_range[1]) &
+                df['Month'].between(month_range[0], month_range[1])
+            ]
 
         if df.empty:
             st.warning("Data kosong setelah filter.")
             st.stop()
 
         # =====================================================
-        # LOOKUP CABANG → LAT/LON
+        # AGGREGATION (CABANG → LAT/LON)
         # =====================================================
-        cabang_lookup = {
-            "Banda Aceh": (5.5483, 95.3238),
-            "Bengkulu": (-3.8000, 102.2650),
-            "Lampung": (-5.4296, 105.2620),
-            "Jambi": (-1.6100, 103.6100),
-            "Kotabumi": (-5.4547, 105.7716),
-            "Lhokseumawe": (5.1919, 97.1456),
-            "Medan": (3.5952, 98.6722),
-            "Metro": (-5.1156, 105.2983),
-            "Padang": (-0.9491, 100.3543),
-            "Palembang": (-2.9761, 104.7754),
-            "Pekanbaru": (0.5333, 101.4500),
-            "Pematang Siantar": (2.9639, 99.0621)
-        }
-
-        df['lat'] = df['CABANG'].map(lambda x: cabang_lookup.get(x, (None, None))[0])
-        df['lon'] = df['CABANG'].map(lambda x: cabang_lookup.get(x, (None, None))[1])
-
-        # =====================================================
-        # AGGREGATION
-        # =====================================================
-        agg = (
-            df.dropna(subset=['lat', 'lon'])
-            .groupby(['CABANG', 'KET', 'lat', 'lon'], as_index=False)
-            .agg(
-                jumlah=('NET VALUE', 'count'),
-                total_value=('NET VALUE', 'sum')
-            )
-        )
+        with profiling.step("agregasi peta"):
+            agg = aggregate_map(df)
 
         if agg.empty:
             st.warning("Data tidak cukup untuk ditampilkan.")
@@ -401,4 +448,16 @@ def ldgtmap():
                 initial_view_state=view_state,
                 tooltip=tooltip
             )
-        )
\ No newline at end of file
+        )
+
+    # =========================
+    # TAB ROUTER (LAZY)
+    # =========================
+    # panel profiling tetap tampil walau tab berhenti lebih awal (st.stop)
+    try:
+        for tab, render in zip(tabs, [render_upload, render_view, render_analytics]):
+            with tab:
+                if tab.open:
+                    render()
+    finally:
+        profiling.render_panel()
@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: hanya lock antar thread
+    fcntl = None
+
+# =========================
+# INGEST MANIFEST
+# =========================
+# data/manifest/<dataset>.json
+# {
+#   "generation": 3,
+#   "files": {
+#     "<nama file upload>": {
+#       "sha256": "...", "rows": 1200, "rejected": 0,
+#       "period_min": 24301, "period_max": 24312,   ← TAHUN * 12 + MONTH
+#       "partitions": [[2025, 1], ...],
+#       "parts": ["TAHUN=2025/MONTH=1/part-<uuid>.parquet", ...],
+#       "ingested_at": "2026-01-05T09:00:00"
+#     }
+#   },
+#   "snapshot": ["TAHUN=2025/MONTH=1/part-<uuid>.parquet", ...],   ← file yang terlihat pembaca
+#   "retired": {"TAHUN=2025/MONTH=1/part-<uuid>.parquet": 3}       ← dihapus fisik nanti (generation)
+# }
+# Pembaca hanya memakai daftar "snapshot" (bukan glob folder). File yang diganti /
+# dihapus masuk "retired" dan baru di-unlink setelah tidak ada pembaca yang
+# masih memegang generation sebelum file itu dipensiunkan.
+MANIFEST_DIR = Path("data/manifest")
+
+# lock antar thread (RLock) + antar proses (flock di data/manifest/.lock):
+# UI Streamlit dan CLI precompute / bench bisa menulis manifest bersamaan
+_lock = threading.RLock()
+_lock_file = None
+_lock_depth = 0
+
+
+class StaleSnapshot(RuntimeError):
+    # file yang mau dipensiunkan sudah tidak ada di snapshot (diganti penulis lain)
+    pass
+
+
+@contextmanager
+def locked():
+    # juga dipegang datastore: baca snapshot + tulis pin, cek pin + hapus file pensiun
+    global _lock_file, _lock_depth
+    with _lock:
+        if _lock_depth == 0 and fcntl is not None:
+            MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
+            _lock_file = open(MANIFEST_DIR / ".lock", "a")
+            fcntl.flock(_lock_file, fcntl.LOCK_EX)
+        _lock_depth += 1
+        try:
+            yield
+        finally:
+            _lock_depth -= 1
+            if _lock_depth == 0 and _lock_file is not None:
+                fcntl.flock(_lock_file, fcntl.LOCK_UN)
+                _lock_file.close()
+                _lock_file = None
+
+
+def manifest_path(dataset):
+    return MANIFEST_DIR / f"{dataset}.json"
+
+
+def load_manifest(dataset):
+    path = manifest_path(dataset)
+    if not path.exists():
+        return {"generation": 0, "files": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(dataset, manifest):
+    # tulis ke file sementara lalu rename → pembaca tidak pernah melihat JSON setengah jadi
+    MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
+    path = manifest_path(dataset)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def find_by_hash(dataset, sha256):
+    for name, entry in load_manifest(dataset)["files"].items():
+        if entry["sha256"] == sha256:
+            return name
+    return None
+
+
+def get_entry(dataset, name):
+    return load_manifest(dataset)["files"].get(name)
+
+
+def period_range(partitions):
+    keys = [y * 12 + m for y, m in partitions if y is not None and m is not None]
+    return (min(keys), max(keys)) if keys else (None, None)
+
+
+def record_ingest(dataset, name, sha256, rows, rejected, parts):
+    partitions = sorted({_partition_of(p) for p in parts})
+    period_min, period_max = period_range(partitions)
+
+    with locked():
+        manifest = load_manifest(dataset)
+        manifest["files"][name] = {
+            "sha256": sha256,
+            "rows": rows,
+            "rejected": rejected,
+            "period_min": period_min,
+            "period_max": period_max,
+            "partitions": [list(p) for p in partitions],
+            "parts": sorted(parts),
+            "ingested_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        manifest["generation"] += 1
+        save_manifest(dataset, manifest)
+
+
+def reset(dataset, initial=()):
+    # semua file di snapshot dipensiunkan; pembaca yang sedang jalan tetap bisa membaca
+    with locked():
+        manifest = load_manifest(dataset)
+        live = manifest.get("snapshot", list(initial))
+        manifest["generation"] += 1
+        manifest["files"] = {}
+        manifest["snapshot"] = []
+        retired = manifest.setdefault("retired", {})
+        for part in live:
+            retired[part] = manifest["generation"]
+        save_manifest(dataset, manifest)
+        return manifest["generation"]
+
+
+# =========================
+# SNAPSHOT (ISOLASI PEMBACA)
+# =========================
+def snapshot(dataset):
+    # (generation, [relpath, ...]); None = dataset lama yang belum punya snapshot
+    manifest = load_manifest(dataset)
+    return manifest["generation"], manifest.get("snapshot")
+
+
+def commit_snapshot(dataset, added=(), removed=(), initial=()):
+    # 1 tulis manifest atomik: file baru terlihat + file lama dipensiunkan bersamaan.
+    # initial = isi folder saat ini, dipakai sekali untuk dataset tanpa snapshot.
+    # removed harus masih live: hasil tulis ulang dari snapshot usang → StaleSnapshot,
+    # pemanggil membuang outputnya dan mengulang (baris tidak pernah terhitung dobel)
+    with locked():
+        manifest = load_manifest(dataset)
+        live = set(manifest.get("snapshot", initial))
+        removed = set(removed)
+        stale = removed - live
+        if stale:
+            raise StaleSnapshot(f"{dataset}: {len(stale)} file sudah tidak ada di snapshot")
+        live = (live | set(added)) - removed
+
+        manifest["generation"] += 1
+        manifest["snapshot"] = sorted(live)
+        retired = manifest.setdefault("retired", {})
+        for part in removed:
+            retired[part] = manifest["generation"]
+        save_manifest(dataset, manifest)
+        return manifest["generation"], manifest["snapshot"]
+
+
+def retired_parts(dataset):
+    return dict(load_manifest(dataset).get("retired", {}))
+
+
+def release_retired(dataset, parts):
+    # file sudah di-unlink → hapus dari daftar retired
+    with locked():
+        manifest = load_manifest(dataset)
+        retired = manifest.get("retired", {})
+        for part in parts:
+            retired.pop(part, None)
+        save_manifest(dataset, manifest)
+
+
+def _partition_of(part):
+    # "TAHUN=2025/MONTH=1/part-x.parquet" → (2025, 1)
+    keys = dict(seg.split("=", 1) for seg in Path(part).parts[:-1] if "=" in seg)
+    return (_as_int(keys.get("TAHUN")), _as_int(keys.get("MONTH")))
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
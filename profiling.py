@@ -0,0 +1,276 @@
+import contextlib
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import duckdb
+import pandas as pd
+import streamlit as st
+
+# =========================
+# PROFILING PER RERUN (OPT-IN)
+# =========================
+# Aktif → setiap con.execute lewat cursor session dicatat (waktu, baris
+# di-scan, byte dibaca, peak memori buffer DuckDB + plan EXPLAIN ANALYZE),
+# begitu juga langkah pandas yang dibungkus step(). Tidak aktif → cursor
+# dipakai apa adanya, tanpa overhead.
+STATE_KEY = "query_profiler"
+ENABLED_CONS_KEY = "profiling_cons"
+
+PROFILE_SETTINGS = {
+    "LATENCY": "true",
+    "CPU_TIME": "true",
+    "CUMULATIVE_ROWS_SCANNED": "true",
+    "TOTAL_BYTES_READ": "true",
+    "SYSTEM_PEAK_BUFFER_MEMORY": "true",
+    "OPERATOR_TYPE": "true",
+    "OPERATOR_NAME": "true",
+    "OPERATOR_TIMING": "true",
+    "OPERATOR_CARDINALITY": "true",
+    "EXTRA_INFO": "true",
+}
+
+SQL_PREVIEW_CHARS = 160
+
+# frame di file ini (dan contextlib untuk step()) dilewati saat mencari pemanggil
+_SKIP_FILES = {os.path.abspath(__file__), os.path.abspath(contextlib.__file__)}
+
+
+def _caller():
+    # frame pertama di luar modul ini → "file.py:baris fungsi"
+    frame = sys._getframe(1)
+    while frame and os.path.abspath(frame.f_code.co_filename) in _SKIP_FILES:
+        frame = frame.f_back
+    if frame is None:
+        return "?"
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+def _compact_sql(sql):
+    return " ".join(str(sql).split())
+
+
+def enable(con):
+    con.execute("PRAGMA enable_profiling = 'no_output'")
+    con.execute(f"SET custom_profiling_settings = '{json.dumps(PROFILE_SETTINGS)}'")
+
+
+def disable(con):
+    con.execute("PRAGMA disable_profiling")
+
+
+class QueryProfiler:
+
+    def __init__(self, page):
+        self.page = page
+        self.created = datetime.now().isoformat(timespec="seconds")
+        self.started = time.perf_counter()
+        self.entries = []
+
+    def wrap(self, con):
+        return ProfiledConnection(con, self)
+
+    def add(self, entry):
+        entry["#"] = len(self.entries) + 1
+        self.entries.append(entry)
+        return entry
+
+    @contextmanager
+    def step(self, label):
+        # langkah Python / pandas: waktu saja. Peak alokasi (tracemalloc) global per
+        # proses → session lain yang ikut profiling mengacaukan angkanya
+        source = _caller()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add({
+                "kind": "python",
+                "source": source,
+                "label": label,
+                "wall_s": time.perf_counter() - started,
+            })
+
+    def total_seconds(self):
+        return time.perf_counter() - self.started
+
+    def to_frame(self):
+        cols = [
+            "#", "kind", "source", "label", "wall_s", "result_rows",
+            "rows_scanned", "bytes_read", "peak_memory",
+        ]
+        return pd.DataFrame(self.entries).reindex(columns=cols)
+
+    def to_json(self):
+        return json.dumps({
+            "page": self.page,
+            "created": self.created,
+            "total_seconds": self.total_seconds(),
+            "duckdb": duckdb.__version__,
+            "entries": self.entries,
+        }, indent=2, default=str)
+
+
+class ProfiledConnection:
+    # pembungkus cursor DuckDB: execute dicatat, atribut lain diteruskan
+
+    def __init__(self, con, profiler):
+        self._con = con
+        self._profiler = profiler
+
+    def execute(self, query, parameters=None):
+        entry = self._profiler.add({
+            "kind": "sql",
+            "source": _caller(),
+            "label": _compact_sql(query)[:SQL_PREVIEW_CHARS],
+            "sql": str(query),
+        })
+        started = time.perf_counter()
+        if parameters is None:
+            self._con.execute(query)
+        else:
+            self._con.execute(query, parameters)
+        entry["wall_s"] = time.perf_counter() - started
+        return _ProfiledResult(self._con, entry, started)
+
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+
+
+class _ProfiledResult:
+    # profil DuckDB baru lengkap setelah hasil habis di-fetch
+
+    def __init__(self, con, entry, started):
+        self._con = con
+        self._entry = entry
+        self._started = started
+
+    def _finish(self, result_rows):
+        entry = self._entry
+        entry["wall_s"] = time.perf_counter() - self._started
+        entry["result_rows"] = result_rows
+        try:
+            profile = json.loads(self._con.get_profiling_information(format="json"))
+            entry["latency_s"] = profile.get("latency")
+            entry["cpu_s"] = profile.get("cpu_time")
+            entry["rows_scanned"] = profile.get("cumulative_rows_scanned")
+            entry["bytes_read"] = profile.get("total_bytes_read")
+            entry["peak_memory"] = profile.get("system_peak_buffer_memory")
+            entry["plan"] = self._con.get_profiling_information(format="query_tree")
+        except (duckdb.Error, ValueError):
+            entry["plan"] = None
+
+    def df(self, *args, **kwargs):
+        df = self._con.df(*args, **kwargs)
+        self._finish(len(df))
+        return df
+
+    fetchdf = df
+
+    def to_arrow_table(self, *args, **kwargs):
+        table = self._con.to_arrow_table(*args, **kwargs)
+        self._finish(table.num_rows)
+        return table
+
+    def fetchall(self):
+        rows = self._con.fetchall()
+        self._finish(len(rows))
+        return rows
+
+    def fetchone(self):
+        # fetchall → profil query tercatat (fetchone tidak menghabiskan hasil)
+        rows = self.fetchall()
+        return rows[0] if rows else None
+
+    def __getattr__(self, name):
+        return getattr(self._con, name)
+
+
+# =========================
+# API HALAMAN STREAMLIT
+# =========================
+def start_rerun(page, enabled):
+    profiler = QueryProfiler(page) if enabled else None
+    st.session_state[STATE_KEY] = profiler
+    return profiler
+
+
+def active():
+    return st.session_state.get(STATE_KEY)
+
+
+def instrument(con):
+    # cursor session → versi tercatat jika profiling aktif; profiling DuckDB
+    # dimatikan lagi di cursor yang sama setelah toggle dimatikan
+    enabled = st.session_state.setdefault(ENABLED_CONS_KEY, set())
+    profiler = active()
+    if profiler is None:
+        if id(con) in enabled:
+            disable(con)
+            enabled.discard(id(con))
+        return con
+    if id(con) not in enabled:
+        enable(con)
+        enabled.add(id(con))
+    return profiler.wrap(con)
+
+
+def step(label):
+    profiler = active()
+    return profiler.step(label) if profiler else nullcontext()
+
+
+def _fmt_bytes(n):
+    if n is None or pd.isna(n):
+        return "—"
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(n) < 1024:
+            return f"{n:,.0f} {unit}"
+        n /= 1024
+    return f"{n:,.1f} TB"
+
+
+def render_panel():
+    profiler = active()
+    if profiler is None:
+        return
+
+    with st.expander(f"🩺 Profiling rerun ini — {len(profiler.entries)} langkah", expanded=False):
+        if not profiler.entries:
+            st.caption("Belum ada query / langkah yang tercatat di rerun ini.")
+            return
+
+        df = profiler.to_frame()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Total rerun", f"{profiler.total_seconds() * 1000:,.0f} ms")
+        c2.metric("Query DuckDB", f"{df.loc[df['kind'] == 'sql', 'wall_s'].sum() * 1000:,.0f} ms")
+        c3.metric("Langkah Python", f"{df.loc[df['kind'] == 'python', 'wall_s'].sum() * 1000:,.0f} ms")
+
+        view = df.copy()
+        view["wall_ms"] = (view.pop("wall_s") * 1000).round(1)
+        for col in ["bytes_read", "peak_memory"]:
+            view[col] = view[col].map(_fmt_bytes)
+        st.dataframe(view, use_container_width=True, hide_index=True)
+
+        with_plan = [e for e in profiler.entries if e.get("plan")]
+        if with_plan:
+            pick = st.selectbox(
+                "Plan EXPLAIN ANALYZE",
+                [e["#"] for e in with_plan],
+                format_func=lambda i: f"#{i} {profiler.entries[i - 1]['source']}",
+                key=f"profiling_plan_{profiler.page}",
+            )
+            entry = profiler.entries[pick - 1]
+            st.code(entry["sql"], language="sql")
+            st.code(entry["plan"])
+
+        st.download_button(
+            label="⬇️ Export Profiling (JSON)",
+            data=profiler.to_json,
+            file_name=f"profiling-{profiler.page}-{profiler.created.replace(':', '')}.json",
+            mime="application/json",
+            key=f"profiling_export_{profiler.page}",
+        )
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+# =========================
+# RESULT CACHE (MEMORI + DISK)
+# =========================
+# Tier 1: LRU di memori proses (per server Streamlit).
+# Tier 2: file parquet di data/cache/<nama>/ → dipakai bersama semua proses server.
+# Nilai = pyarrow.Table (immutable) → hit tidak perlu disalin.
+# Key sudah memuat versi dataset, jadi entri lama tidak pernah salah;
+# cukup dibuang oleh eviction berdasarkan ukuran / jumlah.
+CACHE_DIR = Path("data/cache")
+
+MEMORY_MAX_ENTRIES = 32
+DISK_MAX_BYTES = 256 * 1024 * 1024
+
+
+def cache_key(*parts):
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+
+    def __init__(self, name, memory_entries=MEMORY_MAX_ENTRIES, disk_bytes=DISK_MAX_BYTES):
+        self.directory = CACHE_DIR / name
+        self.memory_entries = memory_entries
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _path(self, key):
+        return self.directory / f"{key}.parquet"
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            table = pq.read_table(path)
+            os.utime(path)  # mtime = waktu akses terakhir (urutan eviction)
+        except (FileNotFoundError, OSError):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+
+        with self._lock:
+            self.stats["disk_hits"] += 1
+            self._remember(key, table)
+        return table
+
+    def put(self, key, table):
+        with self._lock:
+            self._remember(key, table)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        staged = self.directory / f".{key}-{uuid.uuid4().hex}.tmp"
+        pq.write_table(table, staged)
+        os.replace(staged, self._path(key))
+        self._evict_disk()
+
+    def get_or_compute(self, key, compute):
+        table = self.get(key)
+        if table is None:
+            table = compute()
+            self.put(key, table)
+        return table
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for f in self.directory.glob("*.parquet"):
+            f.unlink(missing_ok=True)
+
+    def _remember(self, key, table):
+        self._memory[key] = table
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        # file paling lama tidak diakses dibuang sampai total ukuran di bawah batas
+        files = []
+        for f in self.directory.glob("*.parquet"):
+            try:
+                stat = f.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, f))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, f in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            f.unlink(missing_ok=True)
+            total -= size
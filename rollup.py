@@ -0,0 +1,222 @@
+import hashlib
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+import isocalendar
+from schemas import clean_col
+
+# =========================
+# ROLLUP SKU × DIMENSI × PERIODE
+# =========================
+# 1 file rollup per file sumber (upload) → append / replace / reset cukup
+# menulis atau menghapus file rollup milik sumber itu saja.
+# data/rollup/<nama rollup>/src-<hash nama file>.parquet
+ROLLUP_DIR = Path("data/rollup")
+# nama marker = versi format rollup; kolom kunci berubah → rebuild penuh sekali
+BUILT_MARKER = "_built_v2"
+
+DIM_COLS = ["REGION", "AREA", "SALES OFFICE", "GROUP", "DISTRIBUTOR", "TIPE"]
+
+# SKU / dimensi disimpan mentah + kembaran kanonik _clean_* (dari part file);
+# kembaran tidak menambah jumlah baris (fungsi dari nilai mentah)
+TEXT_KEYS = ["SKU"] + DIM_COLS + [clean_col(c) for c in ["SKU"] + DIM_COLS]
+
+MONTHLY_KEYS = (
+    TEXT_KEYS
+    + ["TAHUN", "MONTH", "DT_YEAR", "DT_MONTH"]
+)
+
+WEEKLY_KEYS = (
+    TEXT_KEYS
+    + ["ISO_YEAR", "ISO_WEEK", "MONTH_ISO", "WEEK_IN_MONTH"]
+)
+
+
+def _q(col):
+    return f'"{col}"'
+
+
+def rollup_file(directory, source_file):
+    key = hashlib.sha1(str(source_file).encode("utf-8")).hexdigest()[:16]
+    return Path(directory) / f"src-{key}.parquet"
+
+
+def monthly_select(source, extra_keys=""):
+    keys = ", ".join(_q(c) for c in TEXT_KEYS + ["TAHUN", "MONTH"])
+    return f"""
+        SELECT
+            {extra_keys}{keys},
+            CAST(EXTRACT(YEAR FROM TANGGAL) AS INTEGER)  AS DT_YEAR,
+            CAST(EXTRACT(MONTH FROM TANGGAL) AS INTEGER) AS DT_MONTH,
+            SUM(Value)   AS value_sum,
+            COUNT(Value) AS value_count
+        FROM {source}
+        GROUP BY ALL
+    """
+
+
+def weekly_select(source, extra_keys=""):
+    # (TAHUN, WEEK) dibaca sebagai (tahun ISO, minggu ISO).
+    # Month ISO / WEEK_IN_MONTH dari Kamis minggu ISO (isocalendar)
+    keys = ", ".join(_q(c) for c in TEXT_KEYS)
+    return f"""
+        SELECT
+            {extra_keys}{keys},
+            TAHUN AS ISO_YEAR,
+            WEEK  AS ISO_WEEK,
+            {isocalendar.month_iso_expr("TAHUN", "WEEK")}     AS MONTH_ISO,
+            {isocalendar.week_in_month_expr("TAHUN", "WEEK")} AS WEEK_IN_MONTH,
+            SUM(Value) AS value_sum
+        FROM {source}
+        GROUP BY ALL
+    """
+
+
+# nama tabel in-memory → (kolom kunci, kolom nilai, builder SELECT)
+ROLLUPS = {
+    "sales_monthly": (MONTHLY_KEYS, ["value_sum", "value_count"], monthly_select),
+    "sales_weekly": (WEEKLY_KEYS, ["value_sum"], weekly_select),
+}
+
+
+def rollup_dir(name):
+    return ROLLUP_DIR / name
+
+
+def _write_atomic(con, select_sql, out, params=None):
+    out.parent.mkdir(parents=True, exist_ok=True)
+    staged = out.parent / f".{out.stem}-{uuid.uuid4().hex}.tmp"
+    con.execute(
+        f"COPY ({select_sql}) TO '{staged}' (FORMAT PARQUET, COMPRESSION ZSTD)",
+        params
+    )
+    os.replace(staged, out)
+
+
+def _reaggregate(name, source):
+    keys, measures, _ = ROLLUPS[name]
+    return f"""
+        SELECT
+            {", ".join(_q(c) for c in keys)},
+            {", ".join(f"SUM({m}) AS {m}" for m in measures)}
+        FROM {source}
+        GROUP BY ALL
+    """
+
+
+# =========================
+# INCREMENTAL (PER FILE SUMBER)
+# =========================
+def write_source_rollup(con, source_file, files, replace=True):
+    # dipanggil setelah ingest: hanya part file baru yang di-scan.
+    # replace=False → baris lama dengan nama sumber sama (data sebelum manifest) tetap dihitung
+    if not files:
+        if replace:
+            drop_source_rollup(source_file)
+        return
+
+    file_list = ", ".join(f"'{f}'" for f in files)
+    source = (
+        f"read_parquet([{file_list}], hive_partitioning = true, "
+        f"hive_types = {{'TAHUN': INTEGER, 'MONTH': INTEGER}}, union_by_name = true)"
+    )
+
+    for name, (_, _, select) in ROLLUPS.items():
+        out = rollup_file(rollup_dir(name), source_file)
+        select_sql = select(source)
+        if not replace and out.exists():
+            select_sql = _reaggregate(
+                name,
+                f"(SELECT * FROM read_parquet('{out}') UNION ALL BY NAME {select_sql})"
+            )
+        _write_atomic(con, select_sql, out)
+
+
+def drop_source_rollup(source_file):
+    for name in ROLLUPS:
+        rollup_file(rollup_dir(name), source_file).unlink(missing_ok=True)
+
+
+def reset_rollups():
+    for name in ROLLUPS:
+        shutil.rmtree(rollup_dir(name), ignore_errors=True)
+
+
+# =========================
+# FULL REBUILD (DATA LAMA TANPA ROLLUP)
+# =========================
+def rebuild_rollup(con, name, source):
+    directory = rollup_dir(name)
+    shutil.rmtree(directory, ignore_errors=True)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    # 1 scan fakta → rollup semua sumber sekaligus, lalu dipecah per file sumber
+    _, _, select = ROLLUPS[name]
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _rollup_rebuild AS
+        {select(source, extra_keys="COALESCE(_source_file, '') AS _src, ")}
+    """)
+    try:
+        sources = [
+            row[0] for row in
+            con.execute("SELECT DISTINCT _src FROM _rollup_rebuild").fetchall()
+        ]
+        for src in sources:
+            _write_atomic(
+                con,
+                "SELECT * EXCLUDE (_src) FROM _rollup_rebuild WHERE _src = ?",
+                rollup_file(directory, src),
+                [src]
+            )
+    finally:
+        con.execute("DROP TABLE IF EXISTS _rollup_rebuild")
+
+    (directory / BUILT_MARKER).touch()
+    return len(sources)
+
+
+def ensure_rollups(con, source):
+    # rollup yang belum pernah dibangun (data lama / jenis rollup baru) → rebuild penuh sekali
+    for name in ROLLUPS:
+        if not rollups_built(name):
+            rebuild_rollup(con, name, source)
+
+
+def rollups_built(name=None):
+    names = [name] if name else list(ROLLUPS)
+    return all((rollup_dir(n) / BUILT_MARKER).exists() for n in names)
+
+
+def mark_built():
+    for name in ROLLUPS:
+        rollup_dir(name).mkdir(parents=True, exist_ok=True)
+        (rollup_dir(name) / BUILT_MARKER).touch()
+
+
+# =========================
+# TABEL IN-MEMORY UNTUK QUERY
+# =========================
+def rollup_version():
+    # fingerprint file rollup (path, ukuran, mtime) → sama di semua proses server
+    digest = hashlib.sha1()
+    for name in ROLLUPS:
+        for f in sorted(rollup_dir(name).glob("*.parquet")):
+            stat = f.stat()
+            digest.update(f"{name}/{f.name}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def register_rollup_tables(con):
+    # gabungkan rollup per sumber jadi 1 tabel (ukuran ~ jumlah SKU × dimensi × periode)
+    for name in ROLLUPS:
+        directory = rollup_dir(name)
+        if not any(directory.glob("*.parquet")):
+            con.execute(f"DROP TABLE IF EXISTS {name}")
+            continue
+
+        con.execute(f"""
+            CREATE OR REPLACE TABLE {name} AS
+            {_reaggregate(name, f"read_parquet('{directory}/*.parquet', union_by_name = true)")}
+        """)
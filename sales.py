@@ -1,14 +1,21 @@
 import streamlit as st
-import pandas as pd
 from pathlib import Path
-import duckdb
 import uuid
-import shutil
-import tempfile
-import calendar
-from datetime import date, timedelta
-import datetime
 from streamlit import column_config
+from salesdb import SalesEngine, PARQUET_DIR_SALES, PARQUET_DIR_TARGET
+import analytics
+import datagrid
+import datastore
+import dimensions
+import exports
+import filestats
+import governor
+import ingest
+import profiling
+import resultcache
+import rollup
+import schemas
+import summary
 
 # =========================
 # CONFIG
@@ -18,24 +25,85 @@ st.set_page_config(
     layout="wide"
 )
 
+# jumlah versi dataset yang disimpan per helper cache (versi lama tidak akan dipakai lagi)
+CACHE_MAX_VERSIONS = 4
+
+# =========================
+# DUCKDB ENGINE (SHARED)
+# =========================
+@st.cache_resource
+def get_engine():
+    return SalesEngine()
+
+
+@st.cache_resource
+def get_summary_cache():
+    # cache hasil pivot Analytics: LRU memori + parquet di data/cache (semua proses)
+    return resultcache.ResultCache("summary")
+
+
+def get_admission():
+    # antrian query berat (summary, export) bersama untuk semua session dan halaman LDGT
+    return governor.shared_queue()
+
+
+def heavy_query(label):
+    return governor.heavy_query(get_admission(), label)
+
+
+def get_cursor():
+    # 1 cursor per session, dipakai ulang di setiap rerun
+    if "duckdb_cursor" not in st.session_state:
+        st.session_state.duckdb_cursor = get_engine().cursor()
+    # profiling aktif → setiap execute di rerun ini dicatat
+    return profiling.instrument(st.session_state.duckdb_cursor)
+
+
+def pin_snapshots():
+    # sekali per rerun: view sales / target di cursor session dikunci ke 1 snapshot
+    # manifest → seluruh rerun membaca data yang sama walau session lain upload / reset
+    holder = st.session_state.setdefault("snapshot_holder", uuid.uuid4().hex)
+    snapshots = get_engine().pin_views(get_cursor(), holder, st.session_state.get("snapshot_pinned"))
+    st.session_state.snapshot_pinned = {name: snap["generation"] for name, snap in snapshots.items()}
+    return snapshots
+
+
+def release_snapshot(directory):
+    # reset dari session ini → lease session sendiri tidak menahan file lama sampai TTL
+    datastore.release_pin(directory, st.session_state.get("snapshot_holder", ""))
+
+
+def ensure_view(name, directory):
+    # file bisa muncul dari session lain → daftarkan view jika belum ada
+    engine = get_engine()
+    if not engine.has_view(name) and datastore.has_data(directory):
+        engine.refresh()
+
+
 # =========================
 # APP
 # =========================
 def sales():
 
-    tab1, tab2, tab03, tab3 = st.tabs([
+    # profiling opt-in: catat semua query + langkah pandas di rerun ini
+    profiling.start_rerun("sales", st.sidebar.toggle("🩺 Profiling query", key="profiling_sales"))
+
+    snapshots = pin_snapshots()
+
+    running, waiting = get_admission().status()
+    st.sidebar.caption(f"🚦 Query berat: {running}/{get_admission().max_running} berjalan · {waiting} antri")
+
+    # on_change="rerun" → tab melacak state; hanya tab yang terbuka yang dijalankan
+    tabs = st.tabs([
         "📥 Import Data",
         "📊 Data Sales View",
         "📊 Data Target View",
         "📈 Analytics"
-    ])
+    ], key="sales_tab", on_change="rerun")
 
     # ==================================================
     # DIRECTORY SETUP
     # ==================================================
-    PARQUET_DIR_SALES  = Path("data/parquet/sales")
-    PARQUET_DIR_TARGET = Path("data/parquet/target")
-
     EXCEL_DIR_SALES  = Path("data/excel/sales")
     EXCEL_DIR_TARGET = Path("data/excel/target")
 
@@ -48,7 +116,7 @@ def sales():
     # ==================================================
     # TAB 1 — IMPORT DATA (SALES / TARGET)
     # ==================================================
-    with tab1:
+    def render_import():
         st.subheader("Upload Data → Gabungkan ke Dataset")
 
         # =========================
@@ -88,10 +156,9 @@ def sales():
                     }
 
                 elif uploaded.name.lower().endswith(("xlsx", "xls", "xlsb")):
-                    xls = pd.ExcelFile(uploaded)
                     sheet = st.selectbox(
                         "Pilih sheet",
-                        xls.sheet_names,
+                        ingest.excel_sheet_names(uploaded),
                         key=f"sheet_{uploaded.name}"
                     )
                     st.session_state.files[uploaded.name] = {
@@ -119,29 +186,56 @@ def sales():
         # =========================
         if uploaded_files and st.button(f"🚀 Append ALL {data_type}"):
 
-            for meta in st.session_state.files.values():
-
-                # ---------- READ ----------
-                if meta["type"] == "parquet":
-                    df = pd.read_parquet(meta["file"])
-                elif meta["type"] == "excel":
-                    df = pd.read_excel(meta["file"], sheet_name=meta["sheet"])
-                else:
-                    df = pd.read_csv(meta["file"], delimiter=meta["delimiter"])
+            # ---------- PROGRESS PER FILE ----------
+            bars = {
+                name: st.progress(0.0, text=f"{name}: antri")
+                for name in st.session_state.files
+            }
+
+            def on_progress(name, fraction, status):
+                bars[name].progress(fraction, text=f"{name}: {status}")
+
+            # ---------- READ → TYPED PARQUET (PROCESS POOL, PARTISI TAHUN/MONTH) ----------
+            results = ingest.ingest_parallel(
+                get_cursor(),
+                st.session_state.files,
+                PARQUET_DIR_ACTIVE,
+                data_type,
+                on_progress=on_progress
+            )
 
-                # 🔒 SAFE MODE
-                df = df.astype("string")
+            for name, res in results.items():
+                if res["status"] == "skipped":
+                    st.info(f"⏭️ {name}: isi file sama dengan data yang sudah ada, dilewati")
+                elif res["error"]:
+                    st.error(f"❌ {name}: {res['error']}")
+                elif res["rejected"]:
+                    st.warning(
+                        f"⚠️ {name}: {res['rows']:,} baris masuk, {res['rejected']:,} baris ditolak "
+                        f"(lihat {datastore.REJECT_DIR / PARQUET_DIR_ACTIVE.name})"
+                    )
 
-                # metadata
-                df["_source_file"] = getattr(meta["file"], "name", "uploaded_data")
-                df["_data_type"] = data_type.lower()
+            get_engine().refresh()
+            n_ok = sum(1 for res in results.values() if not res["error"])
+            if n_ok == len(results):
+                st.success(f"✅ Semua file {data_type} berhasil digabung")
+            else:
+                st.warning(f"⚠️ {n_ok} dari {len(results)} file {data_type} berhasil digabung")
+            st.session_state.files = {}
 
-                # ---------- SAVE PARQUET ----------
-                out = PARQUET_DIR_ACTIVE / f"part-{uuid.uuid4().hex}.parquet"
-                df.to_parquet(out, index=False)
+            # fragment kecil menumpuk → gabungkan di background
+            if datastore.needs_compaction(PARQUET_DIR_ACTIVE):
+                datastore.start_background_compaction(get_engine(), PARQUET_DIR_ACTIVE)
+                st.info("🗜️ Compaction dataset berjalan di background")
 
-            st.success(f"✅ Semua file {data_type} berhasil digabung")
-            st.session_state.files = {}
+        # =========================
+        # COMPACTION (ON DEMAND)
+        # =========================
+        if st.button(f"🗜️ Compact Dataset {data_type}"):
+            with st.spinner("Menggabungkan fragment parquet..."):
+                merged = datastore.compact_dataset(get_cursor(), PARQUET_DIR_ACTIVE)
+                get_engine().refresh()
+            st.success(f"✅ {merged} fragment digabung per partisi TAHUN/MONTH")
 
         # =========================
         # RESET DATA (OPTIONAL)
@@ -153,28 +247,33 @@ def sales():
 
         with col1:
             if st.button("⚠️ Reset Data Sales"):
-                shutil.rmtree(PARQUET_DIR_SALES, ignore_errors=True)
-                PARQUET_DIR_SALES.mkdir(parents=True, exist_ok=True)
+                # file lama dihapus setelah tidak ada session yang masih membacanya
+                release_snapshot(PARQUET_DIR_SALES)
+                datastore.reset_dataset(PARQUET_DIR_SALES)
+                rollup.reset_rollups()
+                rollup.mark_built()
+                get_engine().refresh()
                 st.success("✅ Data Sales di-reset")
 
         with col2:
             if st.button("⚠️ Reset Data Target"):
-                shutil.rmtree(PARQUET_DIR_TARGET, ignore_errors=True)
-                PARQUET_DIR_TARGET.mkdir(parents=True, exist_ok=True)
+                release_snapshot(PARQUET_DIR_TARGET)
+                datastore.reset_dataset(PARQUET_DIR_TARGET)
+                get_engine().refresh()
                 st.success("✅ Data Target di-reset")
 
     # ==================================================
     # TAB 2 — VIEW & DOWNLOAD (WITH CLEANING)
     # ==================================================
-    with tab2:
+    def render_sales_view():
         st.subheader("📊 Dataset Info")
 
-        parquet_files = list(PARQUET_DIR_SALES.glob("*.parquet"))
-        if not parquet_files:
+        if not snapshots["sales"]["files"]:
             st.warning("⚠️ Dataset masih kosong")
             st.stop()
 
-        con = duckdb.connect(":memory:")
+        ensure_view("sales", PARQUET_DIR_SALES)
+        con = get_cursor()
 
         # =========================
         # CLEANING OPTION
@@ -188,26 +287,28 @@ def sales():
         # READ SCHEMA
         # =========================
         schema_df = con.execute(
-            f"DESCRIBE SELECT * FROM '{PARQUET_DIR_SALES}/*.parquet'"
+            f"DESCRIBE SELECT * FROM sales"
         ).df()
 
-        all_cols = schema_df["column_name"].tolist()
+        # kolom _clean_* (TRIM + UPPER, dihitung saat ingest) tidak ditampilkan sendiri
+        is_clean = schema_df["column_name"].map(schemas.is_clean_col)
+        clean_cols = set(schema_df.loc[is_clean, "column_name"])
+        schema_df = schema_df[~is_clean]
 
-        string_cols = schema_df[
-            schema_df["column_type"].str.contains("VARCHAR|TEXT", case=False)
-        ]["column_name"].tolist()
+        all_cols = schema_df["column_name"].tolist()
 
         # =========================
         # BUILD SELECT SQL (SAFE FOR SPACES)
         # =========================
+        # cleaning = pilih kolom kanonik, bukan TRIM(UPPER()) di setiap baris
         select_exprs = []
 
         for col in all_cols:
             col_quoted = f'"{col}"'
 
-            if cleaning_on and col in string_cols:
+            if cleaning_on and schemas.clean_col(col) in clean_cols:
                 select_exprs.append(
-                    f"TRIM(UPPER({col_quoted})) AS {col_quoted}"
+                    f'"{schemas.clean_col(col)}" AS {col_quoted}'
                 )
             else:
                 select_exprs.append(col_quoted)
@@ -217,22 +318,10 @@ def sales():
         # =========================
         # METRICS
         # =========================
-        total_rows = con.execute(
-            f"""
-            SELECT COUNT(*)
-            FROM '{PARQUET_DIR_SALES}/*.parquet'
-            """
-        ).fetchone()[0]
-
-        total_value = con.execute(
-            f"""
-            SELECT SUM(TRY_CAST(Value AS DOUBLE))
-            FROM (
-                SELECT {select_sql}
-                FROM '{PARQUET_DIR_SALES}/*.parquet'
-            )
-            """
-        ).fetchone()[0]
+        # dijawab dari stats per part file (ditulis saat ingest), tanpa scan data
+        total_rows, total_value = filestats.dataset_totals(
+            con, PARQUET_DIR_SALES, snapshots["sales"]["files"]
+        )
 
         col1, col2 = st.columns(2)
         col1.metric("📊 Total Rows", f"{total_rows:,}")
@@ -242,17 +331,14 @@ def sales():
         # PREVIEW
         # =========================
         st.divider()
-        st.caption("Preview 1.000 baris pertama (setelah cleaning)")
-
-        df_preview = con.execute(
-            f"""
-            SELECT {select_sql}
-            FROM '{PARQUET_DIR_SALES}/*.parquet'
-            LIMIT 1000
-            """
-        ).df()
+        st.caption("Data (setelah cleaning) — paging, sorting & filter dijalankan di DuckDB")
 
-        st.dataframe(df_preview, use_container_width=True)
+        datagrid.data_grid(
+            con,
+            f"(SELECT {select_sql} FROM sales)",
+            key="grid_sales",
+            version=snapshots["sales"]["version"],
+        )
 
         # =========================
         # SCHEMA
@@ -268,54 +354,37 @@ def sales():
 
         fmt = st.selectbox(
             "Format",
-            ["Parquet (recommended)", "CSV"]
+            list(exports.EXPORT_FORMATS)
         )
 
         if st.button("⬇️ Generate Download"):
-            with tempfile.NamedTemporaryFile(delete=False) as tmp:
-
-                if fmt == "Parquet (recommended)":
-                    out = tmp.name + ".parquet"
-                    con.execute(f"""
-                        COPY (
-                            SELECT {select_sql}
-                            FROM '{PARQUET_DIR_SALES}/*.parquet'
-                        )
-                        TO '{out}'
-                        (FORMAT PARQUET)
-                    """)
-                else:
-                    out = tmp.name + ".csv"
-                    con.execute(f"""
-                        COPY (
-                            SELECT {select_sql}
-                            FROM '{PARQUET_DIR_SALES}/*.parquet'
-                        )
-                        TO '{out}'
-                        (HEADER, DELIMITER ',')
-                    """)
-
-                with open(out, "rb") as f:
-                    st.download_button(
-                        "⬇️ Download File",
-                        data=f,
-                        file_name=Path(out).name,
-                        mime="application/octet-stream"
-                    )
+            # artefak di-cache per versi dataset + cleaning → klik ulang tidak COPY ulang
+            with st.spinner("Menyiapkan file..."):
+                out = exports.export_dataset(
+                    con, "sales", select_sql,
+                    snapshots["sales"]["version"], cleaning_on, fmt,
+                    admit=lambda: heavy_query("Export sales")
+                )
+            st.download_button(
+                "⬇️ Download File",
+                data=exports.read_export(out),
+                file_name=out.name,
+                mime=exports.export_mime(fmt)
+            )
 
 
     # ==================================================
     # TAB 03 — VIEW & DOWNLOAD (WITH CLEANING)
     # ==================================================
-    with tab03:
+    def render_target_view():
         st.subheader("📊 Dataset Info")
 
-        parquet_files = list(PARQUET_DIR_TARGET.glob("*.parquet"))
-        if not parquet_files:
+        if not snapshots["target"]["files"]:
             st.warning("⚠️ Dataset masih kosong")
             st.stop()
 
-        con = duckdb.connect(":memory:")
+        ensure_view("target", PARQUET_DIR_TARGET)
+        con = get_cursor()
 
         # =========================
         # CLEANING OPTION
@@ -329,26 +398,28 @@ def sales():
         # READ SCHEMA
         # =========================
         schema_df = con.execute(
-            f"DESCRIBE SELECT * FROM '{PARQUET_DIR_TARGET}/*.parquet'"
+            f"DESCRIBE SELECT * FROM target"
         ).df()
 
-        all_cols = schema_df["column_name"].tolist()
+        # kolom _clean_* (TRIM + UPPER, dihitung saat ingest) tidak ditampilkan sendiri
+        is_clean = schema_df["column_name"].map(schemas.is_clean_col)
+        clean_cols = set(schema_df.loc[is_clean, "column_name"])
+        schema_df = schema_df[~is_clean]
 
-        string_cols = schema_df[
-            schema_df["column_type"].str.contains("VARCHAR|TEXT", case=False)
-        ]["column_name"].tolist()
+        all_cols = schema_df["column_name"].tolist()
 
         # =========================
         # BUILD SELECT SQL (SAFE FOR SPACES)
         # =========================
+        # cleaning = pilih kolom kanonik, bukan TRIM(UPPER()) di setiap baris
         select_exprs = []
 
         for col in all_cols:
             col_quoted = f'"{col}"'
 
-            if cleaning_on and col in string_cols:
+            if cleaning_on and schemas.clean_col(col) in clean_cols:
                 select_exprs.append(
-                    f"TRIM(UPPER({col_quoted})) AS {col_quoted}"
+                    f'"{schemas.clean_col(col)}" AS {col_quoted}'
                 )
             else:
                 select_exprs.append(col_quoted)
@@ -358,22 +429,10 @@ def sales():
         # =========================
         # METRICS
         # =========================
-        total_rows = con.execute(
-            f"""
-            SELECT COUNT(*)
-            FROM '{PARQUET_DIR_TARGET}/*.parquet'
-            """
-        ).fetchone()[0]
-
-        total_value = con.execute(
-            f"""
-            SELECT SUM(TRY_CAST(Value AS DOUBLE))
-            FROM (
-                SELECT {select_sql}
-                FROM '{PARQUET_DIR_TARGET}/*.parquet'
-            )
-            """
-        ).fetchone()[0]
+        # dijawab dari stats per part file (ditulis saat ingest), tanpa scan data
+        total_rows, total_value = filestats.dataset_totals(
+            con, PARQUET_DIR_TARGET, snapshots["target"]["files"]
+        )
 
         col1, col2 = st.columns(2)
         col1.metric("📊 Total Rows", f"{total_rows:,}")
@@ -383,17 +442,14 @@ def sales():
         # PREVIEW
         # =========================
         st.divider()
-        st.caption("Preview 1.000 baris pertama (setelah cleaning)")
-
-        df_preview = con.execute(
-            f"""
-            SELECT {select_sql}
-            FROM '{PARQUET_DIR_TARGET}/*.parquet'
-            LIMIT 1000
-            """
-        ).df()
+        st.caption("Data (setelah cleaning) — paging, sorting & filter dijalankan di DuckDB")
 
-        st.dataframe(df_preview, use_container_width=True)
+        datagrid.data_grid(
+            con,
+            f"(SELECT {select_sql} FROM target)",
+            key="grid_target",
+            version=snapshots["target"]["version"],
+        )
 
         # =========================
         # SCHEMA
@@ -409,45 +465,28 @@ def sales():
 
         fmt = st.selectbox(
             "Format",
-            ["Parquet (recommended)", "CSV"], key='selectformattarget'
+            list(exports.EXPORT_FORMATS), key='selectformattarget'
         )
 
         if st.button("⬇️ Generate Download", key='targetdownload'):
-            with tempfile.NamedTemporaryFile(delete=False) as tmp:
-
-                if fmt == "Parquet (recommended)":
-                    out = tmp.name + ".parquet"
-                    con.execute(f"""
-                        COPY (
-                            SELECT {select_sql}
-                            FROM '{PARQUET_DIR_TARGET}/*.parquet'
-                        )
-                        TO '{out}'
-                        (FORMAT PARQUET)
-                    """)
-                else:
-                    out = tmp.name + ".csv"
-                    con.execute(f"""
-                        COPY (
-                            SELECT {select_sql}
-                            FROM '{PARQUET_DIR_TARGET}/*.parquet'
-                        )
-                        TO '{out}'
-                        (HEADER, DELIMITER ',')
-                    """)
-
-                with open(out, "rb") as f:
-                    st.download_button(
-                        "⬇️ Download File",
-                        data=f,
-                        file_name=Path(out).name,
-                        mime="application/octet-stream"
-                    )
+            # artefak di-cache per versi dataset + cleaning → klik ulang tidak COPY ulang
+            with st.spinner("Menyiapkan file..."):
+                out = exports.export_dataset(
+                    con, "target", select_sql,
+                    snapshots["target"]["version"], cleaning_on, fmt,
+                    admit=lambda: heavy_query("Export target")
+                )
+            st.download_button(
+                "⬇️ Download File",
+                data=exports.read_export(out),
+                file_name=out.name,
+                mime=exports.export_mime(fmt)
+            )
 
     # ==================================================
     # TAB 3 — ANALYTICS
     # ==================================================
-    with tab3:
+    def render_analytics():
         st.markdown(
                     f"""
                     <style>
@@ -493,20 +532,51 @@ def sales():
                 )
         st.subheader("📊 Analytics Advanced")
 
-        con = duckdb.connect(":memory:")
-        
+        ensure_view("sales", PARQUET_DIR_SALES)
+        ensure_view("target", PARQUET_DIR_TARGET)
+        con = get_cursor()
+
 
         # =========================
         # HELPER: distinct values
         # =========================
-        @st.cache_data
+        # token versi dataset → cache hidup selamanya, tapi otomatis invalid
+        # begitu isi folder parquet berubah (append / reset / compaction)
+        sales_version = (snapshots["sales"]["version"], dimensions.sidecar_version())
+        target_version = snapshots["target"]["version"]
+
+        @st.cache_data(max_entries=CACHE_MAX_VERSIONS)
+        def get_dictionary(version):
+            # 1 file sidecar kecil (dibangun saat ingest), bukan scan seluruh data sales
+            return dimensions.load_dictionary()
+
         def get_distinct(col):
+            return get_dictionary(sales_version).get(col, [])
+
+        @st.cache_data(max_entries=CACHE_MAX_VERSIONS)
+        def get_cube(version):
+            # kombinasi unik 6 kolom filter (sidecar, dibangun saat ingest)
+            return dimensions.load_cube()
+
+        def filter_multiselect(col):
+            # opsi menyempit sesuai pilihan di filter lain; pilihan sendiri tetap ditampilkan
+            selections = {
+                c: st.session_state.get(f"filter_{c}", [])
+                for c in dimensions.FILTER_COLS
+            }
+            options = dimensions.cascade_options(get_cube(sales_version), selections, col)
+            options = sorted(set(options) | set(selections[col]))
+            return st.multiselect(col, options, key=f"filter_{col}")
+
+
+        @st.cache_data(max_entries=CACHE_MAX_VERSIONS * 8)
+        def get_distinct_target_cached(col, version):
             return (
                 con.execute(
                     f"""
                     SELECT DISTINCT
-                        TRIM(UPPER("{col}")) AS val
-                    FROM '{PARQUET_DIR_SALES}/*.parquet'
+                        "{schemas.clean_col(col)}" AS val
+                    FROM target
                     WHERE "{col}" IS NOT NULL
                     """
                 )
@@ -516,23 +586,9 @@ def sales():
                 .tolist()
             )
 
-
-        @st.cache_data
         def get_distinct_target(col):
-            return (
-                con.execute(
-                    f"""
-                    SELECT DISTINCT
-                        TRIM(UPPER("{col}")) AS val
-                    FROM '{PARQUET_DIR_TARGET}/*.parquet'
-                    WHERE "{col}" IS NOT NULL
-                    """
-                )
-                .df()["val"]
-                .dropna()
-                .sort_values()
-                .tolist()
-            )
+            return get_distinct_target_cached(col, target_version)
+
         # =========================
         # FILTERS
         # =========================
@@ -541,29 +597,26 @@ def sales():
 
             with col1:
                 filters = {
-                    "REGION": st.multiselect("REGION", get_distinct("REGION")),
-                    "SALES OFFICE": st.multiselect("SALES OFFICE", get_distinct("SALES OFFICE")),
+                    "REGION": filter_multiselect("REGION"),
+                    "SALES OFFICE": filter_multiselect("SALES OFFICE"),
                 }
 
             with col2:
                 filters.update({
-                    "AREA": st.multiselect("AREA", get_distinct("AREA")),
-                    "GROUP": st.multiselect("GROUP", get_distinct("GROUP")),
+                    "AREA": filter_multiselect("AREA"),
+                    "GROUP": filter_multiselect("GROUP"),
                 })
 
             with col3:
                 filters.update({
-                    "DISTRIBUTOR": st.multiselect("DISTRIBUTOR", get_distinct("DISTRIBUTOR")),
-                    "TIPE": st.multiselect("TIPE", get_distinct("TIPE")),
+                    "DISTRIBUTOR": filter_multiselect("DISTRIBUTOR"),
+                    "TIPE": filter_multiselect("TIPE"),
                 })
 
         # =========================
         # TAHUN & BULAN CLOSED
         # =========================
-        parquet_path = str(PARQUET_DIR_SALES / "*.parquet")
-        tahun_options = sorted(
-            con.execute(f"SELECT DISTINCT CAST(TAHUN AS INTEGER) AS TAHUN FROM '{PARQUET_DIR_SALES}/*.parquet'").df()["TAHUN"]
-        )
+        tahun_options = sorted(int(v) for v in get_distinct("TAHUN"))
 
         st.markdown(
                     f"""
@@ -694,428 +747,60 @@ def sales():
         # Sekarang tahun_hist dan bulan_hist siap dipakai di query
         st.badge(f"Historical Week dipilih: Bulan ke-{bulan_hist} Tahun {tahun_hist}", color='blue')
         
-        # =========================
-        # Generate ISO week calendar otomatis
-        # =========================
-        def generate_iso_calendar(year):
-            first_monday = date(year-1, 12, 29)
-            iso_weeks = []
-            week_num = 1
-            d = first_monday
-            while d.year <= year or (d.year == year+1 and week_num <= 53):
-                iso_weeks.append({
-                    "ISO_WEEK": week_num,
-                    "MONDAY": d,
-                    "SUNDAY": d + timedelta(days=6),
-                    "MONTH": d.month
-                })
-                d += timedelta(days=7)
-                week_num += 1
-            return pd.DataFrame(iso_weeks)
-
-        df_iso = generate_iso_calendar(tahun_hist)
-
-        # =========================
-        # HITUNG 3 BULAN TERAKHIR (exclude bulan closed)
-        # =========================
-        periods = []
-        start_month = bulan_akhir - 1
-        start_year = tahun_akhir
-        if start_month == 0:
-            start_month = 12
-            start_year -= 1
-
-        for i in [2, 1, 0]:
-            m = start_month - i
-            y = start_year
-            if m <= 0:
-                m += 12
-                y -= 1
-            periods.append((y, m))
-
         # =========================
         # WHERE FILTER SQL
         # =========================
-        where_clauses = []
-        for col, vals in filters.items():
-            if vals:
-                safe_vals = ",".join([f"'{v}'" for v in vals])
-                where_clauses.append(f'"{col}" IN ({safe_vals})')
-        where_sql = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
-
-        # =========================
-        # BUILD PIVOT COLUMNS
-        # =========================
-
-        month_exprs = []
-        month_labels = []
-
-        # 3 bulan terakhir
-        for y, m in periods:
-            # ganti label ke format "Mon-YYYY", misal "Okt-2025"
-            month_name = calendar.month_abbr[m]  # 'Jan', 'Feb', 'Mar', ...
-            label = f"{month_name}-{y}"
-            month_labels.append(label)
-
-            month_exprs.append(f"""
-                COALESCE(SUM(
-                    CASE
-                        WHEN EXTRACT(YEAR FROM DT) = {y}
-                        AND EXTRACT(MONTH FROM DT) = {m}
-                        THEN Value
-                    END
-                ),0) AS "{label}"
-            """)
-
-        # AVG 12 BULAN (rolling)
-        # Hitung start dan end bulan/tahun
-        end_year, end_month = tahun_akhir, bulan_akhir
-        end_index = tahun_akhir * 12 + bulan_akhir
-        start_index = end_index - 11
-
-        # start bulan/tahun
-        start_month = end_month - 11
-        start_year = end_year
-        if start_month <= 0:
-            start_month += 12
-            start_year -= 1
-
-        # Label kolom AVG 12M
-        start_label = f"{calendar.month_abbr[start_month]}-{start_year}"
-        end_label = f"{calendar.month_abbr[end_month]}-{end_year}"
-        avg12m_label = f"Avg Sales Per ({start_label} until {end_label})"
-
-        # Kolom AVG 12M, jika tidak ada data → 0
-        month_exprs.append(f"""
-            COALESCE(
-                SUM(
-                    CASE
-                        WHEN (EXTRACT(YEAR FROM DT) * 12 + EXTRACT(MONTH FROM DT))
-                            BETWEEN {start_index} AND {end_index}
-                        THEN Value
-                    END
-                ) / 12,
-            0) AS "{avg12m_label}"
-        """)
-
-        # AVG 3 BULAN TERAKHIR → tambahkan setelah AVG_12M
-        avg3m_label = f"Avg Sales Per ({month_labels[0]} until {month_labels[-1]})"
-        month_exprs.append(f"""
-            ({' + '.join([f'COALESCE("{lbl}",0)' for lbl in month_labels])}) / 3 AS "{avg3m_label}"
-        """)
-
-        # Fungsi buat generate semua Senin 2025-2026 dengan ISO week, Month ISO, dan WEEK_IN_MONTH
-        def generate_iso_week_table_parquet(start_year=2025, end_year=2026):
-            rows = []
-            start_date = datetime.date(start_year-1, 12, 29)  # Senin terakhir tahun sebelumnya
-            end_date = datetime.date(end_year, 12, 31)
-            
-            current = start_date
-            while current <= end_date:
-                if current.weekday() == 0:  # Senin
-                    iso_year, iso_week, iso_weekday = current.isocalendar()
-                    # Month ISO = bulan dari Kamis di minggu ISO
-                    month_iso = (current + datetime.timedelta(days=3)).month
-                    rows.append({
-                        "DT": current,
-                        "ISO_Week": iso_week,
-                        "Tahun_ISO": iso_year,
-                        "Month_ISO": month_iso,
-                        "WEEK_IN_MONTH": 0
-                    })
-                current += datetime.timedelta(days=1)
-            
-            # Hitung WEEK_IN_MONTH per Month ISO
-            df = pd.DataFrame(rows)
-            df = df.sort_values(['Tahun_ISO','Month_ISO','DT']).reset_index(drop=True)
-            df['WEEK_IN_MONTH'] = df.groupby(['Tahun_ISO','Month_ISO']).cumcount() + 1
-            return df
-
-        # Generate dataframe
-        df_iso_week = generate_iso_week_table_parquet(2025, 2026)
-
-        # Simpan ke Parquet
-        df_iso_week.to_parquet("iso_week_2025_2026.parquet", index=False)
-
-
-        # Hitung dulu bulan_prev & tahun_prev
-        if bulan_hist == 1:
-            bulan_hist_prev = 12
-            tahun_prev = tahun_hist - 1
-        else:
-            bulan_hist_prev = bulan_hist - 1
-            tahun_prev = tahun_hist
-
-        if bulan_hist == 12:
-            bulan_next = 1
-            tahun_next = tahun_hist + 1
-        else:
-            bulan_next = bulan_hist + 1
-            tahun_next = tahun_hist
+        where_clauses = analytics.where_clauses(filters)
 
         # =========================
-        # FINAL QUERY + GRAND TOTAL
+        # SUMMARY QUERY (SINGLE-SCAN)
         # =========================
-        sql = f"""
-        WITH base AS (
-                SELECT
-                    UPPER(TRIM(SKU)) AS SKU,
-                    REGION,
-                    AREA,
-                    DISTRIBUTOR,
-                    "SALES OFFICE",
-                    "GROUP",
-                    TRY_CAST(Value AS DOUBLE) AS Value,
-                    CAST(WEEK AS INTEGER)  AS ISO_WEEK,
-                    CAST(TAHUN AS INTEGER) AS TAHUN,
-                    DATE '1899-12-30' + CAST(TANGGAL AS INTEGER) AS DT
-                FROM "{parquet_path}"
-                {where_sql}
-        ),
-
-        -- =========================
-        -- LIST SKU (gabungan sales + target)
-        -- =========================
-        sku_list AS (
-            SELECT DISTINCT SKU FROM base
-        ),
-
-
-        -- =========================
-        -- AGGREGATE BULANAN
-        -- =========================
-        monthly_agg AS (
-            SELECT
-                SKU,
-                {','.join(month_exprs)},
-                AVG(
-                    CASE
-                        WHEN (TAHUN * 12 + EXTRACT(MONTH FROM DT))
-                        BETWEEN ({tahun_akhir} * 12 + {bulan_akhir} - 11)
-                            AND ({tahun_akhir} * 12 + {bulan_akhir})
-                        THEN Value
-                    END
-                ) AS "{avg12m_label}",
-                AVG(
-                    CASE
-                        WHEN (TAHUN * 12 + EXTRACT(MONTH FROM DT))
-                        BETWEEN ({tahun_akhir} * 12 + {bulan_akhir} - 2)
-                            AND ({tahun_akhir} * 12 + {bulan_akhir})
-                        THEN Value
-                    END
-                ) AS "{avg3m_label}"
-            FROM base
-            GROUP BY SKU
-        ),
-
-        -- =========================
-        -- BACA ISO WEEK TABLE DARI EXCEL
-        -- =========================
-        month_week_map AS (
-            SELECT *
-            FROM 'iso_week_2025_2026.parquet'
-        ),
-
-        -- =========================
-        -- MAP DATA KE WEEK BULAN TERPILIH
-        -- =========================
-        week_map AS (
-            SELECT
-                b.SKU,
-                b.Value,
-                m.WEEK_IN_MONTH
-            FROM base b
-            JOIN month_week_map m
-                ON b.ISO_WEEK = m.ISO_Week
-                AND b.TAHUN = m.Tahun_ISO
-            WHERE m.Month_ISO = {bulan_hist}   -- bulan ISO yang dipilih
-            AND m.Tahun_ISO = {tahun_hist}   -- tahun ISO yang dipilih
-        ),
-        -- =========================
-        -- AGGREGATE WEEKLY
-        -- =========================
-        weekly_agg AS (
-            SELECT
-                SKU,
-                SUM(CASE WHEN WEEK_IN_MONTH = 1 THEN Value END) AS W1,
-                SUM(CASE WHEN WEEK_IN_MONTH = 2 THEN Value END) AS W2,
-                SUM(CASE WHEN WEEK_IN_MONTH = 3 THEN Value END) AS W3,
-                SUM(CASE WHEN WEEK_IN_MONTH = 4 THEN Value END) AS W4,
-                SUM(CASE WHEN WEEK_IN_MONTH = 5 THEN Value END) AS W5
-            FROM week_map
-            GROUP BY SKU
-        ),
-
-        
-        -- =========================
-        -- TARGET BY SKU
-        -- =========================
-        target_agg AS (
-            SELECT
-                UPPER(TRIM(SKU)) AS SKU,
-                COALESCE(SUM(TRY_CAST(Value AS DOUBLE)), 0) AS Target
-            FROM 'data/parquet/target/*.parquet'
-            WHERE CAST(TAHUN AS INTEGER) = {tahun_hist}
-            AND CAST(MONTH AS INTEGER) = {bulan_hist}
-            GROUP BY SKU
-        ),
-
-        -- =========================
-        -- SALES BULAN SEKARANG DAN SEBELUMNYA
-        -- =========================
-        sales_for_growth AS (
-            SELECT
-                SKU,
-                SUM(
-                    CASE 
-                        WHEN CAST(MONTH AS INTEGER) = {bulan_hist} 
-                        AND CAST(TAHUN AS INTEGER) = {tahun_hist} 
-                        THEN CAST(Value AS DOUBLE)
-                        ELSE 0
-                    END
-                ) AS sales_curr,
-                SUM(
-                    CASE 
-                        WHEN CAST(MONTH AS INTEGER) = {bulan_hist_prev} 
-                        AND CAST(TAHUN AS INTEGER) = {tahun_prev} 
-                        THEN CAST(Value AS DOUBLE)
-                        ELSE 0
-                    END
-                ) AS sales_prev
-            FROM "{parquet_path}"
-            GROUP BY SKU
-        ),
-
-        -- =========================
-        -- TARGET BULAN BERIKUTNYA
-        -- =========================
-        target_next AS (
-            SELECT
-                SKU,
-                SUM(
-                    CASE
-                            WHEN CAST(MONTH AS INTEGER) = {bulan_next}
-                            AND CAST(TAHUN AS INTEGER) = {tahun_next}
-                            THEN CAST(VALUE AS DOUBLE)
-                        ELSE 0
-                    END
-                ) AS Target
-            FROM 'data/parquet/target/*.parquet'
-            GROUP BY SKU
-        ),
-        
-        sales_next AS (
-                SELECT
-                    SKU,
-                    SUM(
-                        CASE
-                            WHEN CAST(MONTH AS INTEGER) = {bulan_next}
-                            AND CAST(TAHUN AS INTEGER) = {tahun_next}
-                            THEN CAST(VALUE AS DOUBLE)
-                            ELSE 0
-                        END
-                    ) AS sales_next
-                FROM "{parquet_path}"
-                GROUP BY SKU
-            ),
-        -- =========================
-        -- PIVOT FINAL + GROWTH PER SKU
-        -- =========================
-        pivoted AS (
-            SELECT
-                s.SKU,
-                {','.join([f'm."{lbl}"' for lbl in month_labels])},
-                m."{avg12m_label}",
-                m."{avg3m_label}",
-
-                COALESCE(w.W1,0) AS "Historical Week: W1 {calendar.month_abbr[bulan_hist]}-{tahun_hist}",
-                COALESCE(w.W2,0) AS "Historical Week: W2 {calendar.month_abbr[bulan_hist]}-{tahun_hist}",
-                COALESCE(w.W3,0) AS "Historical Week: W3 {calendar.month_abbr[bulan_hist]}-{tahun_hist}",
-                COALESCE(w.W4,0) AS "Historical Week: W4 {calendar.month_abbr[bulan_hist]}-{tahun_hist}",
-                COALESCE(w.W5,0) AS "Historical Week: W5 {calendar.month_abbr[bulan_hist]}-{tahun_hist}",
-
-                COALESCE(w.W1,0) + COALESCE(w.W2,0) + COALESCE(w.W3,0) + COALESCE(w.W4,0) + COALESCE(w.W5,0)
-                    AS "Total Historical Week",
-
-                COALESCE(t.Target,0) AS Target,
-
-                -- =========================
-                -- GROWTH (%)
-                -- =========================
-                CASE 
-                    WHEN g.sales_prev = 0 THEN NULL
-                    ELSE ROUND((g.sales_curr - g.sales_prev) / g.sales_prev * 100, 2)
-                END AS "Growth (%)"
-
-
-            FROM sku_list s
-            LEFT JOIN monthly_agg m ON s.SKU = m.SKU
-            LEFT JOIN weekly_agg w ON s.SKU = w.SKU
-            LEFT JOIN target_agg t ON s.SKU = t.SKU
-            LEFT JOIN sales_for_growth g ON s.SKU = g.SKU
-
-        ),
+        spec = summary.summary_spec(tahun_akhir, bulan_akhir, tahun_hist, bulan_hist, where_clauses)
+        month_labels = spec["month_labels"]
 
-        
-        -- =========================
-        -- Pivoted dengan Achieved (%)
-        -- =========================
-        pivoted_with_achieved AS (
-            SELECT
-                p.*,
-                ROUND(
-                    COALESCE(s_next.sales_next,0) / NULLIF(COALESCE(t_next.Target,0),0) * 100, 2
-                ) AS "Achieved (%)"
-            FROM pivoted p
-            LEFT JOIN sales_next s_next ON p.SKU = s_next.SKU
-            LEFT JOIN target_next t_next ON p.SKU = t_next.SKU
-        ),
-
-
-
-        -- =========================
-        -- GRAND TOTAL
-        -- =========================
-        grand_total AS (
-            SELECT
-                'GRAND TOTAL' AS SKU,
-                {','.join([f'SUM("{lbl}") AS "{lbl}"' for lbl in month_labels])},
-                SUM("{avg12m_label}") AS "{avg12m_label}",
-                SUM("{avg3m_label}") AS "{avg3m_label}",
-                SUM("Historical Week: W1 {calendar.month_abbr[bulan_hist]}-{tahun_hist}") AS "Historical Week: W1 {calendar.month_abbr[bulan_hist]}-{tahun_hist}",
-                SUM("Historical Week: W2 {calendar.month_abbr[bulan_hist]}-{tahun_hist}") AS "Historical Week: W2 {calendar.month_abbr[bulan_hist]}-{tahun_hist}",
-                SUM("Historical Week: W3 {calendar.month_abbr[bulan_hist]}-{tahun_hist}") AS "Historical Week: W3 {calendar.month_abbr[bulan_hist]}-{tahun_hist}",
-                SUM("Historical Week: W4 {calendar.month_abbr[bulan_hist]}-{tahun_hist}") AS "Historical Week: W4 {calendar.month_abbr[bulan_hist]}-{tahun_hist}",
-                SUM("Historical Week: W5 {calendar.month_abbr[bulan_hist]}-{tahun_hist}") AS "Historical Week: W5 {calendar.month_abbr[bulan_hist]}-{tahun_hist}",
-                SUM("Total Historical Week") AS "Total Historical Week",
-                SUM(Target) AS Target,
-                NULL AS "Growth (%)",
-                ROUND(
-                    SUM(COALESCE("Achieved (%)",0)) / COUNT(*) , 2
-                ) AS "Achieved (%)"
-            FROM pivoted_with_achieved
-        ),
-
-
-        final AS (
-            SELECT * FROM pivoted_with_achieved
-            UNION ALL
-            SELECT * FROM grand_total
+        # target: hanya file yang rentang periodenya mencakup bulan historical / berikutnya
+        target_source = filestats.pruned_source(
+            con, PARQUET_DIR_TARGET, [spec["hist"], spec["next"]], fallback="target",
+            files=snapshots["target"]["files"],
         )
 
-        SELECT *
-        FROM final
-        ORDER BY
-            CASE WHEN SKU = 'GRAND TOTAL' THEN 0 ELSE 1 END,
-            SKU
-        """
-
-        df = con.execute(sql).df()
+        compare_query = st.toggle("⏱️ Bandingkan waktu dengan query lama", key="summary_compare")
+        if compare_query:
+            with heavy_query("Bandingkan query summary"):
+                df, timing = summary.compare_summary(con, spec, target_source)
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Single-scan", f"{timing['single_scan'] * 1000:,.0f} ms")
+            c2.metric("Query lama", f"{timing['legacy'] * 1000:,.0f} ms")
+            c3.metric("Hasil identik", "✅ Ya" if timing["same"] else "❌ Tidak")
+        else:
+            # tanpa filter → hasil batch malam (analytics.py precompute) jika versinya masih sama
+            df = None
+            if not where_clauses:
+                df = analytics.load_precomputed(
+                    analytics.summary_version(get_engine().rollup_version, target_version),
+                    (tahun_akhir, bulan_akhir),
+                    (tahun_hist, bulan_hist),
+                )
 
-        # pastikan numeric
-        for c in df.columns:
-            if c != "SKU":
-                df[c] = pd.to_numeric(df[c], errors="coerce")
+            if df is not None:
+                st.caption("⚡ Hasil precompute batch (tanpa query)")
+            else:
+                summary_cache = get_summary_cache()
+                key = resultcache.cache_key(
+                    "summary", spec, get_engine().rollup_version, target_version
+                )
+                def compute():
+                    # antri hanya saat cache miss; hit dijawab langsung
+                    with heavy_query("Historical Summary"):
+                        return summary.run_summary(con, spec, target_source)[0]
+
+                with profiling.step("summary (result cache)"):
+                    df = summary_cache.get_or_compute(key, compute)
+                stats = summary_cache.stats
+                st.caption(
+                    f"🗃️ Cache hasil — memori: {stats['memory_hits']} hit · "
+                    f"disk: {stats['disk_hits']} hit · miss: {stats['misses']}"
+                )
 
         # =========================
         # SHOW TABLE
@@ -1164,40 +849,34 @@ def sales():
                     """, unsafe_allow_html=True
                 )
         st.badge(f"Periode Pivot: {month_labels[0]} → {month_labels[-1]} (Closed Month)", color='blue')
-        df_display = df.copy()
-        df_display["SKU"] = df_display["SKU"].astype(str)
-
-        df_display.loc[
-            df_display["SKU"] == "GRAND TOTAL",
-            "SKU"
-        ] = "🔹 GRAND TOTAL"
+        # hasil = pyarrow.Table (DOUBLE dari DuckDB) → langsung ke st.dataframe tanpa pandas
         st.dataframe(
-            df_display,
+            summary.display_table(df),
             use_container_width=True
         )
 
         # =========================
         # DOWNLOAD BUTTON (angka tetap numeric)
         # =========================
-        df_download = df.copy()
-
-        # =========================
-        # Siapkan df_download
-        # =========================
-        df_download = df.copy()
-
-        # Loop semua kolom kecuali SKU
-        for c in df_download.columns:
-            if c != "SKU":
-                # Convert ke numeric, coerce jika ada error
-                df_download[c] = pd.to_numeric(df_download[c], errors='coerce')
-                # Bulatkan 2 desimal (atau gunakan .0 untuk bulat)
-                df_download[c] = df_download[c].round(2)  # pakai 0 untuk integer: .round(0)
-                
+        # CSV (dibulatkan 2 desimal di DuckDB) baru dibuat saat tombol diklik
         st.download_button(
             label="📥 Download Historical Summary",
-            data=df_download.to_csv(index=False),
+            data=lambda: summary.summary_csv(df),
             file_name=f"Historical Summary Sales Tahun {tahun_hist}.csv",
             mime="text/csv"
         )
 
+    # ==================================================
+    # TAB ROUTER (LAZY)
+    # ==================================================
+    # tab lain tidak menjalankan query apa pun; hasil beratnya tetap tersimpan
+    # di cache (st.cache_data / result cache) saat tab dibuka lagi
+    renders = [render_import, render_sales_view, render_target_view, render_analytics]
+    # panel profiling tetap tampil walau tab berhenti lebih awal (st.stop)
+    try:
+        for tab, render in zip(tabs, renders):
+            with tab:
+                if tab.open:
+                    render()
+    finally:
+        profiling.render_panel()
@@ -0,0 +1,125 @@
+import threading
+from pathlib import Path
+
+import duckdb
+
+import dimensions
+import filestats
+import governor
+import rollup
+
+from datastore import (
+    canonicalize_parts,
+    dataset_version,
+    migrate_flat_parts,
+    parquet_source,
+    pin_snapshot,
+    retype_legacy_parts,
+    snapshot_files,
+)
+
+# =========================
+# DATASET LOCATION
+# =========================
+PARQUET_DIR_SALES  = Path("data/parquet/sales")
+PARQUET_DIR_TARGET = Path("data/parquet/target")
+
+
+# =========================
+# SHARED DUCKDB ENGINE
+# =========================
+# Satu database DuckDB untuk seluruh proses Streamlit: semua session memakai
+# catalog, buffer pool dan parquet metadata cache yang sama. Tiap session
+# mengambil cursor sendiri; view dibuat ulang lewat refresh() setelah
+# folder parquet berubah (append / reset / compaction).
+class SalesEngine:
+
+    def __init__(self, database=":memory:"):
+        self.con = duckdb.connect(database)
+        # memory_limit / threads / folder spill berlaku untuk semua cursor
+        governor.configure(self.con)
+        self.con.execute("SET parquet_metadata_cache = true")
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def cursor(self):
+        # cursor DuckDB = koneksi baru ke database yang sama (thread-safe per cursor)
+        with self._lock:
+            return self.con.cursor()
+
+    def refresh(self):
+        with self._lock:
+            for name, directory in [
+                ("sales", PARQUET_DIR_SALES),
+                ("target", PARQUET_DIR_TARGET),
+            ]:
+                migrate_flat_parts(self.con, directory)
+                retype_legacy_parts(self.con, directory)
+                canonicalize_parts(self.con, directory)
+                self._register_view(name, directory)
+                # stats per part file (file baru / hasil compaction / data lama)
+                filestats.sync_stats(self.con, directory)
+
+            # rollup bulanan: dibangun penuh sekali untuk data lama, selanjutnya per ingest
+            if self._has_view(self.con, "sales"):
+                rollup.ensure_rollups(self.con, "sales")
+            # versi tabel rollup yang sedang dimuat → bagian key result cache
+            self.rollup_version = rollup.rollup_version()
+            rollup.register_rollup_tables(self.con)
+            # nilai filter Analytics → file sidecar kecil, dibangun ulang jika rollup berubah
+            dimensions.refresh_dictionary(self.con)
+
+    def has_view(self, name):
+        # dipanggil dari rerun session mana pun → cursor sendiri, bukan self.con
+        # yang mungkin sedang dipakai refresh() di thread lain
+        cur = self.cursor()
+        try:
+            return self._has_view(cur, name)
+        finally:
+            cur.close()
+
+    @staticmethod
+    def _has_view(con, name):
+        return bool(
+            con.execute(
+                "SELECT COUNT(*) FROM duckdb_views() WHERE view_name = ?",
+                [name]
+            ).fetchone()[0]
+        )
+
+    def _register_view(self, name, directory):
+        # DuckDB menolak daftar file kosong → view hanya dibuat jika snapshot berisi file
+        files = snapshot_files(directory)[1]
+        if files:
+            self.con.execute(
+                f"CREATE OR REPLACE VIEW {name} AS "
+                f"SELECT * FROM {parquet_source(directory, files)}"
+            )
+        else:
+            self.con.execute(f"DROP VIEW IF EXISTS {name}")
+
+    def pin_views(self, con, holder, pinned=None):
+        # sekali per rerun: TEMP VIEW sales / target di cursor ini dikunci ke 1 snapshot
+        # (menutupi view global) → upload / reset / compaction dari session lain
+        # tidak mengubah data di tengah rerun. pinned = {nama: generation} terpasang
+        pinned = pinned or {}
+        snapshots = {}
+        for name, directory in [
+            ("sales", PARQUET_DIR_SALES),
+            ("target", PARQUET_DIR_TARGET),
+        ]:
+            generation, files = pin_snapshot(directory, holder)
+            if pinned.get(name) != generation:
+                if files:
+                    con.execute(
+                        f"CREATE OR REPLACE TEMP VIEW {name} AS "
+                        f"SELECT * FROM {parquet_source(directory, files)}"
+                    )
+                else:
+                    con.execute(f"DROP VIEW IF EXISTS temp.{name}")
+            snapshots[name] = {
+                "generation": generation,
+                "files": files,
+                "version": dataset_version(directory, (generation, files)),
+            }
+        return snapshots
@@ -0,0 +1,177 @@
+# =========================
+# SCHEMA REGISTRY (INGEST)
+# =========================
+# Tipe kolom dikonversi sekali saat upload → query analytics membaca
+# DOUBLE / INTEGER / DATE langsung tanpa CAST di setiap rerun.
+# Kolom di luar schema tetap disimpan sebagai VARCHAR.
+SALES_SCHEMA = {
+    "REGION": "VARCHAR",
+    "AREA": "VARCHAR",
+    "SALES OFFICE": "VARCHAR",
+    "GROUP": "VARCHAR",
+    "DISTRIBUTOR": "VARCHAR",
+    "TIPE": "VARCHAR",
+    "SKU": "VARCHAR",
+    "TANGGAL": "DATE",
+    "WEEK": "INTEGER",
+    "TAHUN": "INTEGER",
+    "MONTH": "INTEGER",
+    "Value": "DOUBLE",
+}
+
+TARGET_SCHEMA = {
+    "SKU": "VARCHAR",
+    "TAHUN": "INTEGER",
+    "MONTH": "INTEGER",
+    "Value": "DOUBLE",
+}
+
+SCHEMAS = {
+    "sales": SALES_SCHEMA,
+    "target": TARGET_SCHEMA,
+}
+
+# baris tanpa kolom ini ditolak (kunci partisi)
+REQUIRED_COLS = ["TAHUN", "MONTH"]
+
+REJECT_REASON_COL = "_reject_reason"
+
+# kolom teks kanonik: TRIM + UPPER dihitung sekali saat ingest dan disimpan
+# di samping nilai mentah sebagai "_clean_<kolom>". Toggle Cleaning, kamus
+# filter dan summary cukup memilih kolom, tanpa fungsi string per baris.
+CLEAN_PREFIX = "_clean_"
+
+
+def quote(col):
+    return '"' + col.replace('"', '""') + '"'
+
+
+def clean_col(col):
+    return CLEAN_PREFIX + col
+
+
+def is_clean_col(col):
+    # nama kolom DuckDB case-insensitive
+    return col.upper().startswith(CLEAN_PREFIX.upper())
+
+
+def has_clean_twin(col):
+    # kolom metadata (_source_file, _data_type) dan _clean_* sendiri tidak dikembarkan
+    return not col.startswith("_")
+
+
+def clean_expr(expr):
+    return f"TRIM(UPPER({expr}))"
+
+
+def _convert_expr(raw, col_type):
+    # semua sumber di-CAST ke VARCHAR dulu → aman untuk kolom campuran
+    txt = f"NULLIF(TRIM(CAST({raw} AS VARCHAR)), '')"
+    if col_type == "VARCHAR":
+        return f"CAST({raw} AS VARCHAR)"
+    if col_type == "DOUBLE":
+        return f"TRY_CAST({txt} AS DOUBLE)"
+    if col_type == "INTEGER":
+        return f"TRY_CAST(TRY_CAST({txt} AS DOUBLE) AS INTEGER)"
+    if col_type == "DATE":
+        # serial Excel (1899-12-30 + n) atau string tanggal / timestamp
+        return (
+            f"COALESCE("
+            f"DATE '1899-12-30' + TRY_CAST(TRY_CAST({txt} AS DOUBLE) AS INTEGER), "
+            f"TRY_CAST(TRY_CAST({txt} AS TIMESTAMP) AS DATE))"
+        )
+    raise ValueError(f"Tipe kolom tidak dikenal: {col_type}")
+
+
+def _match_columns(source_cols, schema):
+    # nama kolom upload dicocokkan case-insensitive (Value / VALUE / value)
+    by_upper = {c.strip().upper(): c for c in source_cols}
+    return {col: by_upper.get(col.upper()) for col in schema}
+
+
+def typed_exprs(source_cols, schema):
+    matched = _match_columns(source_cols, schema)
+    used = {c for c in matched.values() if c is not None}
+
+    exprs = []
+    text = []  # (kolom output, ekspresi VARCHAR) → kembaran kanonik
+    for col, col_type in schema.items():
+        src = matched[col]
+        if src is None:
+            expr = f"CAST(NULL AS {col_type})"
+        else:
+            expr = _convert_expr(quote(src), col_type)
+        exprs.append(f"{expr} AS {quote(col)}")
+        if col_type == "VARCHAR" and has_clean_twin(col):
+            text.append((col, expr))
+
+    for c in source_cols:
+        # kolom _clean_* bawaan file upload (mis. hasil export lama) dihitung ulang
+        if c not in used and not is_clean_col(c):
+            expr = f"CAST({quote(c)} AS VARCHAR)"
+            exprs.append(f"{expr} AS {quote(c)}")
+            if has_clean_twin(c):
+                text.append((c, expr))
+
+    for col, expr in text:
+        exprs.append(f"{clean_expr(expr)} AS {quote(clean_col(col))}")
+    return exprs
+
+
+def reject_reason_expr(source_cols, schema):
+    matched = _match_columns(source_cols, schema)
+    checks = []
+    for col, col_type in schema.items():
+        src = matched[col]
+        if col in REQUIRED_COLS:
+            if src is None:
+                checks.append(f"'{col} kosong'")
+                continue
+            converted = _convert_expr(quote(src), col_type)
+            checks.append(f"CASE WHEN {converted} IS NULL THEN '{col} kosong/invalid' END")
+        elif src is not None and col_type != "VARCHAR":
+            txt = f"NULLIF(TRIM(CAST({quote(src)} AS VARCHAR)), '')"
+            converted = _convert_expr(quote(src), col_type)
+            checks.append(
+                f"CASE WHEN {txt} IS NOT NULL AND {converted} IS NULL "
+                f"THEN '{col} bukan {col_type}' END"
+            )
+    if not checks:
+        return "''"
+    return f"CONCAT_WS(', ', {', '.join(checks)})"
+
+
+def typed_select(source_cols, schema, source):
+    return (
+        f"SELECT {', '.join(typed_exprs(source_cols, schema))} "
+        f"FROM {source} "
+        f"WHERE {reject_reason_expr(source_cols, schema)} = ''"
+    )
+
+
+def rejected_select(source_cols, schema, source):
+    raw = ", ".join(f"CAST({quote(c)} AS VARCHAR) AS {quote(c)}" for c in source_cols)
+    reason = reject_reason_expr(source_cols, schema)
+    return (
+        f"SELECT {raw}, {reason} AS {REJECT_REASON_COL} "
+        f"FROM {source} "
+        f"WHERE {reason} <> ''"
+    )
+
+
+def missing_clean_cols(column_types):
+    # file sebelum canonicalization: kolom teks tanpa kembaran _clean_*
+    return [
+        c for c, t in column_types.items()
+        if t == "VARCHAR" and has_clean_twin(c) and clean_col(c) not in column_types
+    ]
+
+
+def needs_retype(column_types, schema):
+    # file lama (SAFE MODE): kolom bertipe selain VARCHAR masih tersimpan sebagai string
+    matched = _match_columns(list(column_types), schema)
+    for col, col_type in schema.items():
+        src = matched[col]
+        if src is not None and col_type != "VARCHAR" and column_types[src] == "VARCHAR":
+            return True
+    return False
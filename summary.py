@@ -0,0 +1,485 @@
+import calendar
+import time
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+import datastore
+from schemas import clean_col, quote
+
+# =========================
+# HISTORICAL SUMMARY (ANALYTICS)
+# =========================
+# Query single-scan: rollup bulanan dan target masing-masing dibaca 1x,
+# semua kolom metrik dari 1 pass conditional aggregation.
+# Query lama tetap disimpan untuk perbandingan waktu (toggle di tab Analytics).
+
+# SKU kanonik sudah dihitung saat ingest (rollup + part file target)
+CLEAN_SKU = quote(clean_col("SKU"))
+
+
+def _prev_month(y, m):
+    return (y - 1, 12) if m == 1 else (y, m - 1)
+
+
+def _next_month(y, m):
+    return (y + 1, 1) if m == 12 else (y, m + 1)
+
+
+def summary_spec(tahun_akhir, bulan_akhir, tahun_hist, bulan_hist, where_clauses):
+    # 3 bulan terakhir (exclude bulan closed)
+    periods = []
+    y, m = _prev_month(tahun_akhir, bulan_akhir)
+    for _ in range(3):
+        periods.insert(0, (y, m))
+        y, m = _prev_month(y, m)
+
+    # ganti label ke format "Mon-YYYY", misal "Okt-2025"
+    month_labels = [f"{calendar.month_abbr[m]}-{y}" for y, m in periods]
+
+    # AVG 12 BULAN (rolling) s/d bulan closed
+    end_index = tahun_akhir * 12 + bulan_akhir
+    start_year, start_month = divmod(end_index - 12, 12)
+    start_label = f"{calendar.month_abbr[start_month + 1]}-{start_year}"
+    end_label = f"{calendar.month_abbr[bulan_akhir]}-{tahun_akhir}"
+
+    week_prefix = f"Historical Week: W{{}} {calendar.month_abbr[bulan_hist]}-{tahun_hist}"
+
+    return {
+        "periods": periods,
+        "month_labels": month_labels,
+        "avg12m_label": f"Avg Sales Per ({start_label} until {end_label})",
+        "avg3m_label": f"Avg Sales Per ({month_labels[0]} until {month_labels[-1]})",
+        "week_labels": [week_prefix.format(i) for i in range(1, 6)],
+        "avg12m_range": (end_index - 11, end_index),
+        "tahun_akhir": tahun_akhir,
+        "bulan_akhir": bulan_akhir,
+        "hist": (tahun_hist, bulan_hist),
+        "prev": _prev_month(tahun_hist, bulan_hist),
+        "next": _next_month(tahun_hist, bulan_hist),
+        "where_clauses": list(where_clauses),
+    }
+
+
+def _period_cond(period, year_col="TAHUN", month_col='"MONTH"'):
+    y, m = period
+    return f"{year_col} = {int(y)} AND {month_col} = {int(m)}"
+
+
+def _weekly_agg_sql(spec):
+    # rollup mingguan, WEEK_IN_MONTH sudah dihitung saat ingest
+    tahun_hist, bulan_hist = spec["hist"]
+    and_filter_sql = "".join(f" AND {c}" for c in spec["where_clauses"])
+    weeks = ",\n".join(
+        f"SUM(CASE WHEN WEEK_IN_MONTH = {i} THEN value_sum END) AS W{i}"
+        for i in range(1, 6)
+    )
+    return f"""
+        weekly_agg AS (
+            SELECT
+                {CLEAN_SKU} AS SKU,
+                {weeks}
+            FROM sales_weekly
+            WHERE MONTH_ISO = {bulan_hist}   -- bulan ISO yang dipilih
+            AND ISO_YEAR = {tahun_hist}      -- tahun ISO yang dipilih
+            {and_filter_sql}
+            GROUP BY 1
+        )
+    """
+
+
+def _week_cols_sql(spec):
+    cols = [
+        f'COALESCE(w.W{i},0) AS "{lbl}"'
+        for i, lbl in enumerate(spec["week_labels"], start=1)
+    ]
+    total = " + ".join(f"COALESCE(w.W{i},0)" for i in range(1, 6))
+    return ",\n".join(cols + [f'{total} AS "Total Historical Week"'])
+
+
+def _grand_total_sql(spec, source):
+    sum_cols = spec["month_labels"] + [spec["avg12m_label"], spec["avg3m_label"]] + \
+        spec["week_labels"] + ["Total Historical Week"]
+    return f"""
+        grand_total AS (
+            SELECT
+                'GRAND TOTAL' AS SKU,
+                {', '.join(f'SUM("{c}") AS "{c}"' for c in sum_cols)},
+                SUM(Target) AS Target,
+                NULL AS "Growth (%)",
+                ROUND(
+                    SUM(COALESCE("Achieved (%)",0)) / COUNT(*) , 2
+                ) AS "Achieved (%)"
+            FROM {source}
+        ),
+
+        final AS (
+            SELECT * FROM {source}
+            UNION ALL
+            SELECT * FROM grand_total
+        )
+
+        SELECT *
+        FROM final
+        ORDER BY
+            CASE WHEN SKU = 'GRAND TOTAL' THEN 0 ELSE 1 END,
+            SKU
+    """
+
+
+# =========================
+# SINGLE-SCAN
+# =========================
+def summary_sql(spec, target_source="target"):
+    pred = " AND ".join(spec["where_clauses"]) or "TRUE"
+    labels = spec["month_labels"]
+    avg12m_label, avg3m_label = spec["avg12m_label"], spec["avg3m_label"]
+    avg_start, avg_end = spec["avg12m_range"]
+
+    month_sums = ",\n".join(
+        f"SUM(CASE WHEN {pred} AND {_period_cond(p, 'DT_YEAR', 'DT_MONTH')} "
+        f"THEN value_sum END) AS m{i}"
+        for i, p in enumerate(spec["periods"])
+    )
+    month_cols = ",\n".join(
+        f'COALESCE(SUM(m{i}),0) AS "{lbl}"' for i, lbl in enumerate(labels)
+    )
+    avg3m = " + ".join(f'COALESCE(m."{lbl}",0)' for lbl in labels)
+
+    # semua metrik per SKU kanonik (_clean_SKU, TRIM + UPPER saat ingest);
+    # metrik bulanan setelah filter dimensi, growth / achieved tanpa filter
+    return f"""
+        WITH
+        -- 1 scan rollup bulanan: semua metrik per SKU
+        sales_raw AS MATERIALIZED (
+            SELECT
+                {CLEAN_SKU} AS SKU,
+                BOOL_OR({pred}) AS in_filter,
+                {month_sums},
+                SUM(
+                    CASE
+                        WHEN {pred}
+                        AND (DT_YEAR * 12 + DT_MONTH) BETWEEN {avg_start} AND {avg_end}
+                        THEN value_sum
+                    END
+                ) AS avg12m_sum,
+                SUM(CASE WHEN {_period_cond(spec["hist"])} THEN value_sum ELSE 0 END) AS sales_curr,
+                SUM(CASE WHEN {_period_cond(spec["prev"])} THEN value_sum ELSE 0 END) AS sales_prev,
+                SUM(CASE WHEN {_period_cond(spec["next"])} THEN value_sum ELSE 0 END) AS sales_next
+            FROM sales_monthly
+            GROUP BY ALL
+        ),
+
+        sales_sku AS (
+            SELECT
+                SKU,
+                {month_cols},
+                COALESCE(SUM(avg12m_sum) / 12, 0) AS "{avg12m_label}"
+            FROM sales_raw
+            WHERE in_filter
+            GROUP BY SKU
+        ),
+
+        -- 1 scan target: bulan historical + bulan berikutnya
+        target_raw AS MATERIALIZED (
+            SELECT
+                {CLEAN_SKU} AS SKU,
+                SUM(CASE WHEN {_period_cond(spec["hist"])} THEN Value END) AS target_curr,
+                SUM(CASE WHEN {_period_cond(spec["next"])} THEN Value ELSE 0 END) AS target_next
+            FROM {target_source}
+            WHERE {datastore.partition_filter([spec["hist"], spec["next"]])}
+            GROUP BY ALL
+        ),
+
+        target_sku AS (
+            SELECT SKU, COALESCE(SUM(target_curr), 0) AS Target
+            FROM target_raw
+            GROUP BY SKU
+        ),
+
+        {_weekly_agg_sql(spec)},
+
+        pivoted AS (
+            SELECT
+                s.SKU,
+                {', '.join(f'm."{lbl}"' for lbl in labels)},
+                m."{avg12m_label}",
+                ({avg3m}) / 3 AS "{avg3m_label}",
+                {_week_cols_sql(spec)},
+                COALESCE(t.Target,0) AS Target,
+                CASE
+                    WHEN g.sales_prev = 0 THEN NULL
+                    ELSE ROUND((g.sales_curr - g.sales_prev) / g.sales_prev * 100, 2)
+                END AS "Growth (%)",
+                ROUND(
+                    COALESCE(g.sales_next,0) / NULLIF(COALESCE(tn.target_next,0),0) * 100, 2
+                ) AS "Achieved (%)"
+            -- self join: SKU NULL tetap muncul tanpa nilai bulanan (sama dengan query lama)
+            FROM (SELECT SKU FROM sales_sku) s
+            LEFT JOIN sales_sku m ON s.SKU = m.SKU
+            LEFT JOIN weekly_agg w ON s.SKU = w.SKU
+            LEFT JOIN target_sku t ON s.SKU = t.SKU
+            LEFT JOIN sales_raw g ON s.SKU = g.SKU
+            LEFT JOIN target_raw tn ON s.SKU = tn.SKU
+        ),
+
+        {_grand_total_sql(spec, "pivoted")}
+    """
+
+
+# =========================
+# QUERY LAMA (PEMBANDING)
+# =========================
+def legacy_summary_sql(spec):
+    where_clauses = spec["where_clauses"]
+    where_sql = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+    tahun_akhir, bulan_akhir = spec["tahun_akhir"], spec["bulan_akhir"]
+    tahun_hist, bulan_hist = spec["hist"]
+    tahun_prev, bulan_hist_prev = spec["prev"]
+    tahun_next, bulan_next = spec["next"]
+    month_labels = spec["month_labels"]
+    avg12m_label, avg3m_label = spec["avg12m_label"], spec["avg3m_label"]
+    start_index, end_index = spec["avg12m_range"]
+
+    month_exprs = []
+    for (y, m), label in zip(spec["periods"], month_labels):
+        month_exprs.append(f"""
+            COALESCE(SUM(
+                CASE
+                    WHEN DT_YEAR = {y}
+                    AND DT_MONTH = {m}
+                    THEN value_sum
+                END
+            ),0) AS "{label}"
+        """)
+    month_exprs.append(f"""
+        COALESCE(
+            SUM(
+                CASE
+                    WHEN (DT_YEAR * 12 + DT_MONTH)
+                        BETWEEN {start_index} AND {end_index}
+                    THEN value_sum
+                END
+            ) / 12,
+        0) AS "{avg12m_label}"
+    """)
+    month_exprs.append(f"""
+        ({' + '.join([f'COALESCE("{lbl}",0)' for lbl in month_labels])}) / 3 AS "{avg3m_label}"
+    """)
+
+    return f"""
+        WITH
+        monthly_base AS (
+            SELECT
+                {CLEAN_SKU} AS SKU,
+                TAHUN,
+                DT_YEAR,
+                DT_MONTH,
+                value_sum,
+                value_count
+            FROM sales_monthly
+            {where_sql}
+        ),
+
+        sku_list AS (
+            SELECT DISTINCT SKU FROM monthly_base
+        ),
+
+        monthly_agg AS (
+            SELECT
+                SKU,
+                {','.join(month_exprs)},
+                SUM(
+                    CASE
+                        WHEN (TAHUN * 12 + DT_MONTH)
+                        BETWEEN ({tahun_akhir} * 12 + {bulan_akhir} - 11)
+                            AND ({tahun_akhir} * 12 + {bulan_akhir})
+                        THEN value_sum
+                    END
+                ) / NULLIF(SUM(
+                    CASE
+                        WHEN (TAHUN * 12 + DT_MONTH)
+                        BETWEEN ({tahun_akhir} * 12 + {bulan_akhir} - 11)
+                            AND ({tahun_akhir} * 12 + {bulan_akhir})
+                        THEN value_count
+                    END
+                ), 0) AS "{avg12m_label}",
+                SUM(
+                    CASE
+                        WHEN (TAHUN * 12 + DT_MONTH)
+                        BETWEEN ({tahun_akhir} * 12 + {bulan_akhir} - 2)
+                            AND ({tahun_akhir} * 12 + {bulan_akhir})
+                        THEN value_sum
+                    END
+                ) / NULLIF(SUM(
+                    CASE
+                        WHEN (TAHUN * 12 + DT_MONTH)
+                        BETWEEN ({tahun_akhir} * 12 + {bulan_akhir} - 2)
+                            AND ({tahun_akhir} * 12 + {bulan_akhir})
+                        THEN value_count
+                    END
+                ), 0) AS "{avg3m_label}"
+            FROM monthly_base
+            GROUP BY SKU
+        ),
+
+        {_weekly_agg_sql(spec)},
+
+        target_agg AS (
+            SELECT
+                {CLEAN_SKU} AS SKU,
+                COALESCE(SUM(Value), 0) AS Target
+            FROM target
+            WHERE {datastore.partition_filter([(tahun_hist, bulan_hist)])}
+            -- GROUP BY SKU akan terikat ke kolom SKU mentah, bukan alias
+            GROUP BY 1
+        ),
+
+        sales_for_growth AS (
+            SELECT
+                {CLEAN_SKU} AS SKU,
+                SUM(
+                    CASE
+                        WHEN "MONTH" = {bulan_hist}
+                        AND TAHUN = {tahun_hist}
+                        THEN value_sum
+                        ELSE 0
+                    END
+                ) AS sales_curr,
+                SUM(
+                    CASE
+                        WHEN "MONTH" = {bulan_hist_prev}
+                        AND TAHUN = {tahun_prev}
+                        THEN value_sum
+                        ELSE 0
+                    END
+                ) AS sales_prev
+            FROM sales_monthly
+            WHERE {datastore.partition_filter([(tahun_hist, bulan_hist), (tahun_prev, bulan_hist_prev)])}
+            GROUP BY 1
+        ),
+
+        target_next AS (
+            SELECT
+                {CLEAN_SKU} AS SKU,
+                SUM(
+                    CASE
+                        WHEN "MONTH" = {bulan_next}
+                        AND TAHUN = {tahun_next}
+                        THEN Value
+                        ELSE 0
+                    END
+                ) AS Target
+            FROM target
+            WHERE {datastore.partition_filter([(tahun_next, bulan_next)])}
+            GROUP BY 1
+        ),
+
+        sales_next AS (
+            SELECT
+                {CLEAN_SKU} AS SKU,
+                SUM(
+                    CASE
+                        WHEN "MONTH" = {bulan_next}
+                        AND TAHUN = {tahun_next}
+                        THEN value_sum
+                        ELSE 0
+                    END
+                ) AS sales_next
+            FROM sales_monthly
+            WHERE {datastore.partition_filter([(tahun_next, bulan_next)])}
+            GROUP BY 1
+        ),
+
+        pivoted AS (
+            SELECT
+                s.SKU,
+                {','.join([f'm."{lbl}"' for lbl in month_labels])},
+                m."{avg12m_label}",
+                m."{avg3m_label}",
+                {_week_cols_sql(spec)},
+                COALESCE(t.Target,0) AS Target,
+                CASE
+                    WHEN g.sales_prev = 0 THEN NULL
+                    ELSE ROUND((g.sales_curr - g.sales_prev) / g.sales_prev * 100, 2)
+                END AS "Growth (%)"
+            FROM sku_list s
+            LEFT JOIN monthly_agg m ON s.SKU = m.SKU
+            LEFT JOIN weekly_agg w ON s.SKU = w.SKU
+            LEFT JOIN target_agg t ON s.SKU = t.SKU
+            LEFT JOIN sales_for_growth g ON s.SKU = g.SKU
+        ),
+
+        pivoted_with_achieved AS (
+            SELECT
+                p.*,
+                ROUND(
+                    COALESCE(s_next.sales_next,0) / NULLIF(COALESCE(t_next.Target,0),0) * 100, 2
+                ) AS "Achieved (%)"
+            FROM pivoted p
+            LEFT JOIN sales_next s_next ON p.SKU = s_next.SKU
+            LEFT JOIN target_next t_next ON p.SKU = t_next.SKU
+        ),
+
+        {_grand_total_sql(spec, "pivoted_with_achieved")}
+    """
+
+
+# =========================
+# EKSEKUSI
+# =========================
+def run_summary(con, spec, target_source="target", legacy=False):
+    # hasil = pyarrow.Table bertipe DuckDB (DOUBLE), tanpa konversi ke pandas
+    sql = legacy_summary_sql(spec) if legacy else summary_sql(spec, target_source)
+    start = time.perf_counter()
+    table = con.execute(sql).to_arrow_table()
+    return table, time.perf_counter() - start
+
+
+def compare_summary(con, spec, target_source="target"):
+    # jalankan kedua query → waktu + cek hasil identik
+    df_new, t_new = run_summary(con, spec, target_source)
+    df_old, t_old = run_summary(con, spec, legacy=True)
+    try:
+        pd.testing.assert_frame_equal(
+            df_new.to_pandas(), df_old.to_pandas(), check_dtype=False, check_exact=False, rtol=1e-9
+        )
+        same = True
+    except AssertionError:
+        same = False
+    return df_new, {"single_scan": t_new, "legacy": t_old, "same": same}
+
+
+# =========================
+# TAMPILAN & DOWNLOAD (ARROW)
+# =========================
+GRAND_TOTAL_LABEL = "🔹 GRAND TOTAL"
+
+CSV_DECIMALS = 2
+
+
+def display_table(table):
+    # label baris GRAND TOTAL diganti di kolom Arrow (kolom angka tidak disalin)
+    sku = pc.cast(table["SKU"], pa.string())
+    sku = pc.if_else(pc.equal(sku, "GRAND TOTAL"), GRAND_TOTAL_LABEL, sku)
+    return table.set_column(table.schema.get_field_index("SKU"), "SKU", sku)
+
+
+def rounded_sql(source, decimals=CSV_DECIMALS):
+    return f'SELECT "SKU", ROUND(COLUMNS(* EXCLUDE ("SKU")), {int(decimals)}) FROM {source}'
+
+
+def summary_csv(table, decimals=CSV_DECIMALS):
+    # pembulatan di DuckDB (scan Arrow langsung), CSV ditulis dari Arrow → bytes
+    con = duckdb.connect()
+    try:
+        con.register("_summary", table)
+        rounded = con.execute(rounded_sql("_summary", decimals)).to_arrow_table()
+    finally:
+        con.close()
+    sink = pa.BufferOutputStream()
+    pacsv.write_csv(rounded, sink, pacsv.WriteOptions(quoting_style="needed"))
+    return sink.getvalue().to_pybytes()
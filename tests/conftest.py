@@ -0,0 +1,74 @@
+import datetime
+import random
+import sys
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import datastore  # noqa: E402
+import ingest  # noqa: E402
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # semua path aplikasi relatif ke "data/..." → folder kerja kosong per test
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def sales_frame(n=600, seed=1):
+    # nilai kotor (spasi / huruf kecil) → jalur canonical _clean_* ikut teruji
+    rnd = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        d = datetime.date(rnd.choice([2024, 2025]), rnd.randint(1, 12), rnd.randint(1, 28))
+        rows.append({
+            "REGION": rnd.choice(["SUMATERA", " jawa "]),
+            "AREA": rnd.choice(["A1", "A2"]),
+            "SALES OFFICE": "SO1",
+            "GROUP": rnd.choice(["G1", "G2"]),
+            "DISTRIBUTOR": rnd.choice(["D1", "D2", "D3"]),
+            "TIPE": "T1",
+            "SKU": rnd.choice(["sku1", "SKU2 ", "SKU3"]),
+            "TANGGAL": str((d - datetime.date(1899, 12, 30)).days),
+            "WEEK": str(d.isocalendar()[1]),
+            "TAHUN": str(d.year),
+            "MONTH": str(d.month),
+            "Value": str(round(rnd.random() * 1000, 2)),
+        })
+    return pd.DataFrame(rows)
+
+
+def target_frame(seed=2):
+    # SKU kotor seperti sales_frame → join ke sales harus lewat _clean_SKU
+    rnd = random.Random(seed)
+    rows = [
+        {"SKU": sku, "TAHUN": str(y), "MONTH": str(m), "Value": str(rnd.randint(100, 5000))}
+        for y in (2024, 2025) for m in range(1, 13) for sku in [" Sku1", "SKU2 ", "SKU3"]
+    ]
+    return pd.DataFrame(rows)
+
+
+def write_dataset(df, directory, source_file="upload.csv"):
+    # jalur tulis yang sama dengan ingest (metadata + typed + kolom kanonik)
+    con = duckdb.connect()
+    try:
+        con.register("_frame", df)
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        source = ingest.with_metadata(con, "_frame", source_file, Path(directory).name)
+        return datastore.write_source(con, source, directory)
+    finally:
+        con.close()
+
+
+@pytest.fixture
+def engine(workdir):
+    from salesdb import PARQUET_DIR_SALES, PARQUET_DIR_TARGET, SalesEngine
+
+    write_dataset(sales_frame(), PARQUET_DIR_SALES)
+    write_dataset(target_frame(), PARQUET_DIR_TARGET)
+    return SalesEngine()
@@ -0,0 +1,30 @@
+import pandas as pd
+
+import dimensions
+
+
+def _cube():
+    return pd.DataFrame({
+        "REGION": ["JAWA", "JAWA", "SUMATERA", "SUMATERA", None],
+        "AREA": ["A1", "A2", "A3", "A3", "A4"],
+        "SKU": ["SKU1", "SKU2", "SKU1", "SKU3", "SKU4"],
+    })
+
+
+def test_cascade_options_without_selection_lists_all_values():
+    assert dimensions.cascade_options(_cube(), {}, "REGION") == ["JAWA", "SUMATERA"]
+    assert dimensions.cascade_options(_cube(), {"REGION": []}, "AREA") == ["A1", "A2", "A3", "A4"]
+
+
+def test_cascade_options_narrowed_by_other_columns():
+    cube = _cube()
+    assert dimensions.cascade_options(cube, {"REGION": ["JAWA"]}, "AREA") == ["A1", "A2"]
+    assert dimensions.cascade_options(cube, {"REGION": ["SUMATERA"], "AREA": ["A3"]}, "SKU") == ["SKU1", "SKU3"]
+    assert dimensions.cascade_options(cube, {"SKU": ["SKU1"]}, "REGION") == ["JAWA", "SUMATERA"]
+
+
+def test_cascade_options_ignore_own_selection():
+    # pilihan di kolom itu sendiri tidak mempersempit opsinya → user tetap bisa menambah pilihan
+    cube = _cube()
+    assert dimensions.cascade_options(cube, {"REGION": ["JAWA"]}, "REGION") == ["JAWA", "SUMATERA"]
+    assert dimensions.cascade_options(cube, {"REGION": ["JAWA"], "AREA": ["A3"]}, "REGION") == ["SUMATERA"]
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+import governor
+
+
+def test_parse_bytes_units():
+    assert governor.parse_bytes("4GB") == 4 * 1000 ** 3
+    assert governor.parse_bytes("512 MiB") == 512 * 1024 ** 2
+    assert governor.parse_bytes("1024") == 1024
+    with pytest.raises(ValueError):
+        governor.parse_bytes("4 parsecs")
+
+
+def test_admission_limits_running_queries():
+    queue = governor.AdmissionQueue(running=2, waiting=0)
+    with queue.admit(timeout=0):
+        with queue.admit(timeout=0):
+            assert queue.status() == (2, 0)
+            # slot penuh dan antrian 0 → langsung ditolak
+            with pytest.raises(governor.ServerBusy):
+                with queue.admit(timeout=0):
+                    pass
+    assert queue.status() == (0, 0)
+
+
+def test_admission_waits_fifo():
+    queue = governor.AdmissionQueue(running=1, waiting=2)
+    order = []
+
+    def worker(name):
+        with queue.admit(timeout=5):
+            order.append(name)
+
+    with queue.admit(timeout=0):
+        threads = []
+        for name in ["first", "second"]:
+            t = threading.Thread(target=worker, args=(name,))
+            t.start()
+            threads.append(t)
+            # antri berurutan sebelum worker berikutnya mulai
+            while queue.status()[1] < len(threads):
+                time.sleep(0.01)
+        assert queue.status() == (1, 2)
+        with pytest.raises(governor.ServerBusy):
+            with queue.admit(timeout=0):
+                pass
+    for t in threads:
+        t.join(5)
+
+    assert order == ["first", "second"]
+    assert queue.status() == (0, 0)
+
+
+def test_admission_timeout_leaves_queue():
+    queue = governor.AdmissionQueue(running=1, waiting=1)
+    waits = []
+    with queue.admit(timeout=0):
+        with pytest.raises(governor.ServerBusy):
+            with queue.admit(on_wait=lambda position, waited: waits.append(position), timeout=0.2):
+                pass
+        # tiket yang timeout keluar dari antrian
+        assert queue.status() == (1, 0)
+    assert waits and set(waits) == {1}
+    assert queue.status() == (0, 0)
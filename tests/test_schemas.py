@@ -0,0 +1,79 @@
+import datetime
+
+import duckdb
+import pandas as pd
+
+import schemas
+
+
+def _frame():
+    # semua string, seperti hasil read_csv(all_varchar) / SAFE MODE
+    return pd.DataFrame({
+        "sku": [" sku1", "SKU2", "SKU3", "SKU4", "SKU5", "SKU6"],
+        "tanggal": ["45658", "2025-01-15", "2025-01-20 08:30:00", "", "45660", "45661"],
+        "TAHUN": ["2025", "2025", "2025", "2025", "", "2025"],
+        "MONTH": ["1", "1", "1", "1", "1", "1"],
+        "VALUE": ["10.5", "2", "3", "4", "5", "abc"],
+    })
+
+
+def _run(sql, frame):
+    con = duckdb.connect()
+    con.register("src", frame)
+    return con.execute(sql).fetchdf()
+
+
+def test_typed_select_converts_types_and_dates():
+    frame = _frame()
+    schema = schemas.TARGET_SCHEMA | {"TANGGAL": "DATE"}
+    out = _run(schemas.typed_select(list(frame.columns), schema, "src"), frame)
+
+    # TAHUN kosong dan Value "abc" ditolak; nama kolom dicocokkan case-insensitive
+    assert out["SKU"].tolist() == [" sku1", "SKU2", "SKU3", "SKU4"]
+    assert out["_clean_SKU"].tolist() == ["SKU1", "SKU2", "SKU3", "SKU4"]
+    # serial Excel dan string tanggal / timestamp → DATE; kosong → NULL
+    dates = [None if pd.isna(d) else d.date() for d in out["TANGGAL"]]
+    assert dates == [
+        datetime.date(2025, 1, 1),
+        datetime.date(2025, 1, 15),
+        datetime.date(2025, 1, 20),
+        None,
+    ]
+    assert out["Value"].tolist() == [10.5, 2.0, 3.0, 4.0]
+    assert str(out["TAHUN"].dtype) == "int32"
+
+
+def test_rejected_select_keeps_raw_values_and_reason():
+    frame = _frame()
+    out = _run(schemas.rejected_select(list(frame.columns), schemas.TARGET_SCHEMA, "src"), frame)
+
+    assert out["sku"].tolist() == ["SKU5", "SKU6"]
+    assert out["VALUE"].tolist() == ["5", "abc"]
+    assert out[schemas.REJECT_REASON_COL].tolist() == ["TAHUN kosong/invalid", "Value bukan DOUBLE"]
+
+
+def test_missing_required_column_rejects_every_row():
+    frame = _frame().drop(columns=["MONTH"])
+    out = _run(schemas.rejected_select(list(frame.columns), schemas.TARGET_SCHEMA, "src"), frame)
+    assert len(out) == len(frame)
+    assert out[schemas.REJECT_REASON_COL].str.contains("MONTH kosong").all()
+
+
+def test_clean_twins_skip_metadata_columns():
+    source_cols = ["SKU", "TAHUN", "MONTH", "Value", "NOTE", "_source_file", "_data_type"]
+    sql = ", ".join(schemas.typed_exprs(source_cols, schemas.TARGET_SCHEMA))
+    assert '"_clean_SKU"' in sql
+    assert '"_clean_NOTE"' in sql
+    assert "_clean__" not in sql
+
+
+def test_missing_clean_cols_skip_metadata_columns():
+    column_types = {"SKU": "VARCHAR", "Value": "DOUBLE", "_source_file": "VARCHAR", "_data_type": "VARCHAR"}
+    assert schemas.missing_clean_cols(column_types) == ["SKU"]
+
+
+def test_ingested_view_has_no_metadata_twins(engine):
+    cols = [row[0] for row in engine.con.execute("DESCRIBE sales").fetchall()]
+    assert "_source_file" in cols
+    assert "_clean_SKU" in cols
+    assert not [c for c in cols if c.startswith("_clean__")]
@@ -0,0 +1,195 @@
+import hashlib
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pytest
+
+import datastore
+import filestats
+import ingest
+import manifest
+
+DATASET_DIR = Path("data/parquet/target")
+
+
+def _touch(part):
+    path = DATASET_DIR / part
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x")
+    return path
+
+
+def test_commit_snapshot_adds_and_retires(workdir):
+    gen1, live = manifest.commit_snapshot("target", added=["a", "b"])
+    assert live == ["a", "b"]
+
+    gen2, live = manifest.commit_snapshot("target", added=["c"], removed=["a"])
+    assert gen2 == gen1 + 1
+    assert live == ["b", "c"]
+    assert manifest.retired_parts("target") == {"a": gen2}
+
+
+def test_commit_snapshot_rejects_stale_removed(workdir):
+    manifest.commit_snapshot("target", added=["a", "b"])
+    manifest.commit_snapshot("target", added=["c"], removed=["a"])
+
+    # penulis kedua masih memegang snapshot lama berisi "a"
+    with pytest.raises(manifest.StaleSnapshot):
+        manifest.commit_snapshot("target", added=["d"], removed=["a", "b"])
+    assert manifest.snapshot("target")[1] == ["b", "c"]
+
+
+def test_gc_keeps_files_pinned_by_older_generation(workdir):
+    old = _touch("TAHUN=2025/MONTH=1/part-old.parquet")
+    datastore.commit_parts(DATASET_DIR, added=[old])
+
+    generation, files = datastore.pin_snapshot(DATASET_DIR, "reader")
+    assert files == [old]
+
+    new = _touch("TAHUN=2025/MONTH=1/part-new.parquet")
+
+    datastore.commit_parts(DATASET_DIR, added=[new], removed=[old])
+    # pembaca masih di generation lama → file lama belum boleh hilang
+    assert old.exists()
+
+    datastore.release_pin(DATASET_DIR, "reader")
+    assert datastore.gc_retired(DATASET_DIR) == 1
+    assert not old.exists()
+    assert manifest.retired_parts("target") == {}
+
+
+def test_gc_ignores_expired_pins(workdir, monkeypatch):
+    old = _touch("TAHUN=2025/MONTH=1/part-old.parquet")
+    datastore.commit_parts(DATASET_DIR, added=[old])
+    datastore.pin_snapshot(DATASET_DIR, "idle")
+
+    monkeypatch.setattr(datastore, "PIN_TTL_SECONDS", -1)
+    datastore.reset_dataset(DATASET_DIR)
+    assert not old.exists()
+
+
+def _upload(tmp, name, frame, con):
+    path = Path(tmp) / name
+    frame.to_csv(path, index=False)
+    sha = hashlib.sha256(path.read_bytes()).hexdigest()
+    meta = {"type": "csv", "delimiter": ",", "name": name}
+    res = ingest.ingest_path(path, meta, DATASET_DIR, "Target")
+    return ingest.commit_ingest(con, name, sha, res, DATASET_DIR)
+
+
+def _target(rows, value):
+    return pd.DataFrame({"SKU": [f"S{i}" for i in range(rows)], "TAHUN": 2025, "MONTH": 1, "Value": value})
+
+
+def _totals(con):
+    files = datastore.snapshot_files(DATASET_DIR)[1]
+    return con.execute(f"SELECT COUNT(*), SUM(Value) FROM {datastore.parquet_source(DATASET_DIR, files)}").fetchone()
+
+
+def test_compaction_racing_reupload_never_double_counts(workdir, tmp_path):
+    con = duckdb.connect()
+    DATASET_DIR.mkdir(parents=True)
+    for name, rows, value in [("f0.csv", 5, 2), ("f1.csv", 5, 4), ("f2.csv", 6, 10)]:
+        _upload(tmp_path, name, _target(rows, value), con)
+    datastore.compact_dataset(con, DATASET_DIR)
+    _upload(tmp_path, "f3.csv", _target(1, 1), con)
+    assert _totals(con) == (17, 5 * 2 + 5 * 4 + 6 * 10 + 1)
+
+    # compaction membaca snapshot, lalu f1 diupload ulang (barisnya ada di file hasil compaction)
+    with datastore.pinned(DATASET_DIR, "compaction"):
+        part_dir, inputs = next(iter(datastore._files_by_partition(DATASET_DIR).items()))
+        assert len(inputs) == 2
+        assert _upload(tmp_path, "f1.csv", _target(2, 3), con) == "replaced"
+
+        # commit compaction dengan input usang ditolak, hasilnya dibuang
+        assert datastore.compact_partition(con, DATASET_DIR, part_dir, inputs) is None
+    expected = (5 + 2 + 6 + 1, 5 * 2 + 2 * 3 + 6 * 10 + 1)
+    assert _totals(con) == expected
+
+    # compaction berikutnya mengulang dari snapshot terbaru
+    assert datastore.compact_dataset(con, DATASET_DIR) > 0
+    assert _totals(con) == expected
+    assert len(list(DATASET_DIR.rglob("*.parquet"))) == len(datastore.snapshot_files(DATASET_DIR)[1])
+
+
+def test_rewrites_keep_partition_columns_in_path(workdir, tmp_path):
+    con = duckdb.connect()
+    DATASET_DIR.mkdir(parents=True)
+    for name in ["f0.csv", "f1.csv"]:
+        _upload(tmp_path, name, _target(3, 1), con)
+    datastore.compact_dataset(con, DATASET_DIR)
+    # re-upload → file hasil compaction ditulis ulang tanpa baris f0
+    _upload(tmp_path, "f0.csv", _target(2, 5), con)
+
+    for f in datastore.snapshot_files(DATASET_DIR)[1]:
+        cols = {row[0] for row in con.execute(
+            f"DESCRIBE SELECT * FROM read_parquet('{f}', hive_partitioning = false)"
+        ).fetchall()}
+        assert not cols & set(datastore.PARTITION_COLS), f.name
+    assert _totals(con) == (5, 3 + 10)
+
+
+def test_pinned_stats_ignore_newer_generations(workdir, tmp_path):
+    con = duckdb.connect()
+    DATASET_DIR.mkdir(parents=True)
+    for name in ["f0.csv", "f1.csv"]:
+        _upload(tmp_path, name, _target(3, 2), con)
+    _, pinned = datastore.pin_snapshot(DATASET_DIR, "reader")
+
+    # session lain: compaction + upload baru setelah rerun ini di-pin
+    datastore.compact_dataset(con, DATASET_DIR)
+    _upload(tmp_path, "f2.csv", _target(4, 10), con)
+    assert filestats.dataset_totals(con, DATASET_DIR) == (10, 52.0)
+
+    assert filestats.dataset_totals(con, DATASET_DIR, pinned) == (6, 12.0)
+    source = filestats.pruned_source(con, DATASET_DIR, [(2025, 1)], fallback="target", files=pinned)
+    assert con.execute(f"SELECT COUNT(*), SUM(Value) FROM {source}").fetchone() == (6, 12.0)
+
+
+def test_failed_ingest_commit_removes_published_parts(workdir, tmp_path, monkeypatch):
+    con = duckdb.connect()
+    DATASET_DIR.mkdir(parents=True)
+    _upload(tmp_path, "f0.csv", _target(3, 2), con)
+    _upload(tmp_path, "f1.csv", _target(3, 4), con)
+    datastore.compact_dataset(con, DATASET_DIR)
+    before = sorted(DATASET_DIR.rglob("*.parquet"))
+
+    def always_stale(*args, **kwargs):
+        raise manifest.StaleSnapshot("target: 1 file sudah tidak ada di snapshot")
+
+    monkeypatch.setattr(datastore, "commit_parts", always_stale)
+    with pytest.raises(manifest.StaleSnapshot):
+        _upload(tmp_path, "f1.csv", _target(2, 3), con)
+
+    # parts upload + file tulis ulang delete_source tidak tertinggal di folder dataset
+    assert sorted(DATASET_DIR.rglob("*.parquet")) == before
+    assert _totals(con) == (6, 18.0)
+
+
+def test_retype_leaves_other_writers_parts_alone(workdir, monkeypatch):
+    con = duckdb.connect()
+    part_dir = DATASET_DIR / "TAHUN=2025" / "MONTH=1"
+    part_dir.mkdir(parents=True)
+    # fragment SAFE MODE lama: semua kolom string
+    legacy = part_dir / "part-legacy.parquet"
+    con.register("_legacy", _target(3, 2).astype(str))
+    con.execute(f"COPY _legacy TO '{legacy}' (FORMAT PARQUET)")
+    datastore.commit_parts(DATASET_DIR, added=[legacy])
+
+    # penulis lain mempublish part (belum di-commit) selagi retype menulis
+    foreign = part_dir / "part-foreign.parquet"
+    write_source = datastore.write_source
+
+    def racing_write(*args, **kwargs):
+        result = write_source(*args, **kwargs)
+        con.execute(f"COPY (SELECT 'S9' AS SKU, 1.0 AS Value) TO '{foreign}' (FORMAT PARQUET)")
+        return result
+
+    monkeypatch.setattr(datastore, "write_source", racing_write)
+    assert datastore.retype_legacy_parts(con, DATASET_DIR) == 1
+
+    files = datastore.snapshot_files(DATASET_DIR)[1]
+    assert foreign.exists() and foreign not in files
+    assert legacy not in files
+    assert _totals(con) == (3, 6.0)
@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+import analytics
+import summary
+
+
+def test_summary_spec_labels():
+    spec = summary.summary_spec(2025, 3, 2025, 2, [])
+    assert spec["periods"] == [(2024, 12), (2025, 1), (2025, 2)]
+    assert spec["month_labels"] == ["Dec-2024", "Jan-2025", "Feb-2025"]
+    assert spec["hist"] == (2025, 2)
+    assert spec["prev"] == (2025, 1)
+    assert spec["next"] == (2025, 3)
+    assert spec["avg12m_label"] == "Avg Sales Per (Apr-2024 until Mar-2025)"
+    assert spec["avg3m_label"] == "Avg Sales Per (Dec-2024 until Feb-2025)"
+    assert spec["week_labels"][0] == "Historical Week: W1 Feb-2025"
+
+
+def test_summary_spec_year_boundary():
+    spec = summary.summary_spec(2025, 1, 2024, 12, [])
+    assert spec["month_labels"] == ["Oct-2024", "Nov-2024", "Dec-2024"]
+    assert spec["prev"] == (2024, 11)
+    assert spec["next"] == (2025, 1)
+
+
+@pytest.mark.parametrize("filters", [{}, {"REGION": ["SUMATERA"]}, {"REGION": ["JAWA"]}])
+def test_single_scan_matches_legacy(engine, filters):
+    con = engine.cursor()
+    spec = summary.summary_spec(2025, 6, 2025, 5, analytics.where_clauses(filters))
+
+    new, _ = summary.run_summary(con, spec)
+    old, _ = summary.run_summary(con, spec, legacy=True)
+
+    assert new.num_rows > 1
+    pd.testing.assert_frame_equal(
+        new.to_pandas(), old.to_pandas(), check_dtype=False, check_exact=False, rtol=1e-9
+    )
+    assert summary.compare_summary(con, spec)[1]["same"]
+
+
+def test_summary_uses_canonical_sku(engine):
+    spec = summary.summary_spec(2025, 6, 2025, 5, [])
+    table, _ = summary.run_summary(engine.cursor(), spec)
+    assert table.column("SKU").to_pylist() == ["GRAND TOTAL", "SKU1", "SKU2", "SKU3"]
+
+
+def test_filter_matches_canonical_option(engine):
+    # data mentah " jawa " → opsi filter "JAWA"; pilihan itu harus menghasilkan pivot berisi
+    con = engine.cursor()
+    spec = summary.summary_spec(2025, 6, 2025, 5, analytics.where_clauses({"REGION": ["JAWA"]}))
+    table, _ = summary.run_summary(con, spec)
+    df = table.to_pandas().set_index("SKU")
+
+    assert df.index.tolist() == ["GRAND TOTAL", "SKU1", "SKU2", "SKU3"]
+    label = spec["month_labels"][-1]
+    expected = con.execute(
+        'SELECT SUM(Value) FROM sales WHERE "REGION" = \' jawa \' AND TAHUN = 2025 AND "MONTH" = 5'
+    ).fetchone()[0]
+    assert expected > 0
+    assert df.loc["GRAND TOTAL", label] == pytest.approx(expected)
+
+
+def test_growth_and_achieved_use_canonical_sku(engine):
+    # SKU mentah "sku1" / "SKU2 " / " Sku1" tetap mendapat growth + achieved
+    con = engine.cursor()
+    spec = summary.summary_spec(2025, 6, 2025, 5, [])
+    df = summary.run_summary(con, spec)[0].to_pandas().set_index("SKU").drop("GRAND TOTAL")
+
+    assert df["Growth (%)"].notna().all()
+    assert (df["Achieved (%)"] > 0).all()
+
+    sales_next, target_next = con.execute("""
+        SELECT
+            (SELECT SUM(Value) FROM sales WHERE "_clean_SKU" = 'SKU1' AND TAHUN = 2025 AND "MONTH" = 6),
+            (SELECT SUM(Value) FROM target WHERE "_clean_SKU" = 'SKU1' AND TAHUN = 2025 AND "MONTH" = 6)
+    """).fetchone()
+    assert df.loc["SKU1", "Achieved (%)"] == pytest.approx(round(sales_next / target_next * 100, 2))